@@ -1,5 +1,35 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+# Only what authentication and the permission checks read; everything else is loaded on first access.
+CACHED_USER_FIELDS = ("id", "is_active", "is_staff", "is_superuser")
+
+
+def user_cache_key(user_id):
+    return f"auth_user_{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    """
+    Bumps the generation of the user. An entry written from a read before the bump no longer matches it,
+    even if it is written after this call.
+    """
+
+    key = _user_version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=settings.JWT_USER_CACHE_TIMEOUT)
 
 
 class CookieJWTAuthentication(JWTAuthentication):
@@ -13,3 +43,65 @@ class CookieJWTAuthentication(JWTAuthentication):
             return (user, validated_token)
         except Exception:
             raise AuthenticationFailed('Invalid token')
+
+    def get_user(self, validated_token):
+        """
+        The user is cached for JWT_USER_CACHE_TIMEOUT seconds, so an authenticated request costs no query.
+        The entry holds CACHED_USER_FIELDS and the revoke hash of the password, never the password hash itself.
+        Saving or deleting the user bumps its generation (see signals.py), which outdates the entry.
+        """
+
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        entry_key, version_key = user_cache_key(user_id), _user_version_key(user_id)
+        cached = cache.get_many([entry_key, version_key])
+        entry, version = cached.get(entry_key), cached.get(version_key)
+        if entry is None or version is None or entry["version"] != version:
+            # The generation is read before the database, so a concurrent save outdates what is written here.
+            if version is None:
+                cache.add(version_key, time.time_ns(), timeout=settings.JWT_USER_CACHE_TIMEOUT)
+                version = cache.get(version_key)
+            user = super().get_user(validated_token)
+            cache.set(entry_key, _user_entry(user, version), timeout=settings.JWT_USER_CACHE_TIMEOUT)
+            return user
+
+        # The cached user is current, but the token may be older than the last password change.
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != entry["revoke"]:
+            raise AuthenticationFailed('Invalid token')
+        return _cached_user(entry)
+
+
+class CookieJWTTokenUserAuthentication(CookieJWTAuthentication):
+    """
+    For read-only endpoints (catalogue, HLS). With JWT_TOKEN_USER_FOR_READS the user is built from the token
+    claims (TokenUser) without cache or database access; a deactivated user keeps access until the access token
+    expires. Otherwise the cached user lookup is used.
+    """
+
+    def get_user(self, validated_token):
+        if not settings.JWT_TOKEN_USER_FOR_READS:
+            return super().get_user(validated_token)
+
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        return api_settings.TOKEN_USER_CLASS(validated_token)
+
+
+def _user_version_key(user_id):
+    return f"auth_user_version_{user_id}"
+
+
+def _user_entry(user, version):
+    return {
+        "version": version,
+        "fields": [getattr(user, field) for field in CACHED_USER_FIELDS],
+        "revoke": get_md5_hash_password(user.password),
+    }
+
+
+def _cached_user(entry):
+    # Like User.objects.only(*CACHED_USER_FIELDS): other fields are deferred and save() only writes the loaded ones.
+    user_model = get_user_model()
+    return user_model.from_db(router.db_for_read(user_model), CACHED_USER_FIELDS, entry["fields"])
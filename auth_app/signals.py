@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_cached_user
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def clear_cached_user(sender, instance, **kwargs):
+    """
+    Every save (activation, deactivation, password change, ...) outdates the cached user of the authentication.
+    QuerySet.update() sends no signal: such changes take effect after JWT_USER_CACHE_TIMEOUT.
+    """
+
+    invalidate_cached_user(instance.pk)
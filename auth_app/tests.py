@@ -2,14 +2,19 @@ import os
 from unittest.mock import patch
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.test import APITestCase
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken, TokenError
 
 from .api.token_generators import AccountActivationTokenGenerator, PasswordResetTokenGenerator
+from .authentication import CookieJWTAuthentication, CookieJWTTokenUserAuthentication, user_cache_key
 
 
 class RegisterViewTests(APITestCase):
@@ -399,3 +404,87 @@ class PasswordConfirmViewTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("error", response.data)
+
+
+class CookieJWTAuthenticationTests(TestCase):
+    """
+    Test suite for the cached user lookup of the cookie JWT authentication.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="cached@example.com", password="Pass123!", email="cached@example.com")
+
+    def setUp(self):
+        cache.clear()
+
+    def authenticate(self, authentication=CookieJWTAuthentication):
+        request = RequestFactory().get("/")
+        request.COOKIES["access_token"] = str(AccessToken.for_user(self.user))
+        return authentication().authenticate(request)
+
+    def test_cached_user_needs_no_query(self):
+        """Only the first request loads the user"""
+
+        self.authenticate()
+
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_deactivation_drops_cached_user(self):
+        """Saving the user (deactivation) invalidates the cache entry → the next request is rejected"""
+
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_password_change_reloads_user(self):
+        """After a password change the user is read from the database again"""
+
+        self.authenticate()
+        self.user.set_password("NewPass123!")
+        self.user.save()
+
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate()
+        self.assertTrue(user.check_password("NewPass123!"))
+
+    def test_cache_entry_holds_no_password_hash(self):
+        """Only the auth fields and the revoke hash are cached; other fields load on access, save() keeps them"""
+
+        self.authenticate()
+        entry = cache.get(user_cache_key(self.user.pk))
+        self.assertNotIn(self.user.password, str(entry))
+
+        user, _ = self.authenticate()
+        user.is_staff = True
+        user.save()
+
+        self.assertEqual(user.email, "cached@example.com")
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password("Pass123!"))
+
+    def test_entry_written_after_a_save_is_not_used(self):
+        """A lookup that read the user before a save and writes the cache after it does not hide the save"""
+
+        self.authenticate()
+        stale_entry = cache.get(user_cache_key(self.user.pk))
+        self.user.is_active = False
+        self.user.save()
+        cache.set(user_cache_key(self.user.pk), stale_entry)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(JWT_TOKEN_USER_FOR_READS=True)
+    def test_token_user_for_read_only_endpoints(self):
+        """The read-only variant builds the user from the token claims without a query"""
+
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(CookieJWTTokenUserAuthentication)
+
+        self.assertIsInstance(user, TokenUser)
+        self.assertEqual(str(user.pk), str(self.user.pk))
@@ -2,6 +2,15 @@
 
 set -e
 
+# Role of this container: web (Gunicorn), worker (RQ worker) or all (both, for local development).
+# Passed as the container command (docker-compose.yml) or via APP_ROLE.
+ROLE="${1:-${APP_ROLE:-all}}"
+
+case "$ROLE" in
+  web|worker|all) ;;
+  *) echo "Unknown role '$ROLE' (expected web, worker or all)"; exit 1 ;;
+esac
+
 echo "Waiting for PostgreSQL on $DB_HOST:$DB_PORT..."
 
 # -q for "quiet" (No output other than errors.)
@@ -13,6 +22,10 @@ done
 
 echo "PostgreSQL is ready - continue..."
 
+if [ "$ROLE" = "worker" ]; then
+  exec python manage.py rqworker --with-scheduler default
+fi
+
 # Your original commands (without wait_for_db)
 python manage.py collectstatic --noinput
 python manage.py makemigrations
@@ -38,6 +51,9 @@ else:
     print(f"Superuser '{username}' already exists.")
 EOF
 
-python manage.py rqworker default &
+if [ "$ROLE" = "all" ]; then
+  python manage.py rqworker --with-scheduler default &
+fi
 
-exec gunicorn core.wsgi:application --bind 0.0.0.0:8000 --timeout 900 --reload
+# Workers, worker class, timeouts and reload: gunicorn.conf.py (GUNICORN_* variables)
+exec gunicorn --config gunicorn.conf.py
@@ -0,0 +1,75 @@
+"""
+Latency benchmark for database connection handling (DB_CONN_MAX_AGE, DB_POOL).
+
+Sends sequential requests to the video list (VideoView) of a running server and reports the latency percentiles.
+Every request uses a new `category` value, so the list cache misses and the view runs its query; with
+DB_CONN_MAX_AGE=0 that includes connecting and authenticating to PostgreSQL. The cache entries of those categories
+expire on their own (list pages after an hour, category generations after CATEGORY_VERSION_TIMEOUT).
+Start the server once per setting, e.g.:
+
+    DB_CONN_MAX_AGE=0 gunicorn --config gunicorn.conf.py
+    DB_CONN_MAX_AGE=60 gunicorn --config gunicorn.conf.py
+    DB_POOL=True gunicorn --config gunicorn.conf.py
+
+    python benchmarks/db_connections.py --url http://127.0.0.1:8000/api/video/ --access-token <jwt>
+
+Only the Python standard library is used.
+"""
+
+import argparse, http.client, statistics, time, uuid
+from urllib.parse import urlsplit
+
+
+def timed_requests(url, cookie, count, cached):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    run = uuid.uuid4().hex[:8]
+    latencies = []
+
+    for number in range(count):
+        path = parts.path if cached else f"{parts.path}?category=bench-{run}-{number}"
+        try:
+            started = time.perf_counter()
+            status, body = _get(conn, path, cookie)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # Keep-alive connection closed by a recycled worker (max_requests): reconnect, don't count the error.
+            conn.close()
+            started = time.perf_counter()
+            status, body = _get(conn, path, cookie)
+        latencies.append(time.perf_counter() - started)
+        if status != 200:
+            raise SystemExit(f"Unexpected status {status}: {body[:200]!r}")
+
+    conn.close()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="Video list URL, e.g. http://127.0.0.1:8000/api/video/")
+    parser.add_argument("--access-token", required=True, help="Value of the access_token cookie")
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests")
+    parser.add_argument("--warmup", type=int, default=20, help="Requests before measuring (imports, first connections)")
+    parser.add_argument("--cached", action="store_true", help="Same URL every time (list cache hits, no query)")
+    args = parser.parse_args()
+
+    cookie = f"access_token={args.access_token}"
+    timed_requests(args.url, cookie, args.warmup, args.cached)
+    latencies = sorted(timed_requests(args.url, cookie, args.requests, args.cached))
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    print(f"requests: {len(latencies)} ({'cached' if args.cached else 'cache misses'})")
+    print(f"mean:     {statistics.mean(latencies) * 1000:.2f} ms")
+    print(f"p50 / p95 / p99: {percentile(0.50):.2f} / {percentile(0.95):.2f} / {percentile(0.99):.2f} ms")
+
+
+def _get(conn, path, cookie):
+    conn.request("GET", path, headers={"Cookie": cookie})
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Load test for concurrent slow HLS clients (WSGI sync workers vs. the async ASGI views).
+
+Opens --connections clients that request the same segment and read it at --rate bytes/sec, like mobile players
+on a slow network, while a probe client fetches --probe-url once per second. It reports how many of the slow
+clients got their first byte within --timeout and the probe latency. Run it against one process per server, e.g.:
+
+    gunicorn core.wsgi:application -w 1 --bind 127.0.0.1:8000
+    HLS_ASYNC_VIEWS=True uvicorn core.asgi:application --workers 1 --port 8000
+
+    python benchmarks/hls_concurrency.py --url http://127.0.0.1:8000/api/video/1/720p/segment_000.ts/ \\
+        --probe-url http://127.0.0.1:8000/api/video/1/720p/index.m3u8 --access-token <jwt> --connections 200
+
+Only the Python standard library is used.
+"""
+
+import argparse, asyncio, socket, statistics, time
+from urllib.parse import urlsplit
+
+
+async def slow_client(url, cookie, rate, recv_buffer, timeout, results):
+    """
+    One client: sends the request, waits for the first byte and then drains the body at `rate` bytes/sec.
+    The small receive buffer keeps the kernel from absorbing the whole segment (loopback would hide slow clients).
+    """
+
+    parts = urlsplit(url)
+    started = time.monotonic()
+    try:
+        reader, writer = await asyncio.wait_for(_connect(parts, recv_buffer), timeout)
+        writer.write(_request(parts, cookie))
+        await writer.drain()
+        await asyncio.wait_for(reader.readexactly(1), timeout)
+        results["ttfb"].append(time.monotonic() - started)
+
+        while chunk := await reader.read(max(1, rate // 10)):
+            await asyncio.sleep(len(chunk) / rate)
+        writer.close()
+    except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError):
+        results["failed"] += 1
+
+
+async def probe(url, cookie, timeout, stop, latencies):
+    """
+    A fast client next to the slow ones: does the server still answer a playlist request?
+    """
+
+    parts = urlsplit(url)
+    while not stop.is_set():
+        started = time.monotonic()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(parts.hostname, parts.port or 80), timeout)
+            writer.write(_request(parts, cookie))
+            await writer.drain()
+            await asyncio.wait_for(reader.read(), timeout)
+            writer.close()
+            latencies.append(time.monotonic() - started)
+        except (asyncio.TimeoutError, OSError):
+            latencies.append(float("inf"))
+        await asyncio.sleep(1)
+
+
+async def run(args):
+    cookie = f"access_token={args.access_token}"
+    results, latencies, stop = {"ttfb": [], "failed": 0}, [], asyncio.Event()
+
+    probe_task = asyncio.create_task(probe(args.probe_url, cookie, args.timeout, stop, latencies)) if args.probe_url else None
+    clients = [slow_client(args.url, cookie, args.rate, args.recv_buffer, args.timeout, results) for _ in range(args.connections)]
+    await asyncio.wait_for(asyncio.gather(*clients), args.duration)
+    stop.set()
+    if probe_task:
+        await probe_task
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="Segment URL")
+    parser.add_argument("--probe-url", help="Playlist URL, fetched once per second during the test")
+    parser.add_argument("--access-token", required=True, help="Value of the access_token cookie")
+    parser.add_argument("--connections", type=int, default=100, help="Concurrent slow clients")
+    parser.add_argument("--rate", type=int, default=256 * 1024, help="Read rate of a slow client in bytes/sec")
+    parser.add_argument("--recv-buffer", type=int, default=64 * 1024, help="SO_RCVBUF of a slow client in bytes")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds until a client gives up on the first byte")
+    parser.add_argument("--duration", type=float, default=300.0, help="Upper bound for the whole test in seconds")
+    args = parser.parse_args()
+
+    results, latencies = asyncio.run(run(args))
+
+    ttfb = sorted(results["ttfb"])
+    print(f"connections served: {len(ttfb)} / {args.connections} (failed or timed out: {results['failed']})")
+    if ttfb:
+        print(f"ttfb p50 / p95:     {statistics.median(ttfb) * 1000:.0f} / {ttfb[int(len(ttfb) * 0.95) - 1] * 1000:.0f} ms")
+    if latencies:
+        answered = sorted(latency for latency in latencies if latency != float("inf"))
+        print(f"probe answered:     {len(answered)} / {len(latencies)}")
+        if answered:
+            print(f"probe p50 / max:    {statistics.median(answered) * 1000:.0f} / {answered[-1] * 1000:.0f} ms")
+
+
+async def _connect(parts, recv_buffer):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, (parts.hostname, parts.port or 80))
+    return await asyncio.open_connection(sock=sock)
+
+
+def _request(parts, cookie):
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    return f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nCookie: {cookie}\r\nConnection: close\r\n\r\n".encode()
+
+
+if __name__ == "__main__":
+    main()
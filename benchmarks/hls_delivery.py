@@ -0,0 +1,110 @@
+"""
+Benchmark for HLS segment delivery (HLS_DELIVERY_MODE).
+
+Hammers one segment URL of a running server with concurrent keep-alive clients and reports
+requests/sec plus the peak RSS of every gunicorn worker. Start the server once per mode, e.g.:
+
+    HLS_DELIVERY_MODE=sendfile gunicorn core.wsgi:application -w 4 --pid /tmp/gunicorn.pid
+    python benchmarks/hls_delivery.py --url http://127.0.0.1:8000/api/video/1/720p/segment_000.ts/ \\
+        --access-token <jwt> --pidfile /tmp/gunicorn.pid
+
+In accel mode the numbers show the Django side only; the bytes are sent by nginx.
+Only the Python standard library is used, RSS is read from /proc (Linux).
+"""
+
+import argparse, http.client, os, threading, time
+from urllib.parse import urlsplit
+
+
+def worker_pids(master_pid):
+    pids = []
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if parent == master_pid:
+            pids.append(int(pid))
+    return sorted(pids)
+
+
+def rss_kib(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def client_loop(url, cookie, deadline, results):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    count, received = 0, 0
+
+    while time.monotonic() < deadline:
+        conn.request("GET", path, headers={"Cookie": cookie})
+        response = conn.getresponse()
+        body = response.read()
+        if response.status != 200:
+            raise SystemExit(f"Unexpected status {response.status}: {body[:200]!r}")
+        count += 1
+        received += len(body)
+
+    conn.close()
+    results.append((count, received))
+
+
+def sample_rss(pids, stop, peaks):
+    while not stop.is_set():
+        for pid in pids:
+            peaks[pid] = max(peaks.get(pid, 0), rss_kib(pid))
+        time.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="Segment URL, e.g. http://127.0.0.1:8000/api/video/1/720p/segment_000.ts/")
+    parser.add_argument("--access-token", required=True, help="Value of the access_token cookie")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds")
+    parser.add_argument("--pidfile", help="gunicorn --pid file, used to find the workers for RSS sampling")
+    args = parser.parse_args()
+
+    pids = []
+    if args.pidfile:
+        with open(args.pidfile) as f:
+            pids = worker_pids(int(f.read().strip()))
+
+    stop, peaks, results = threading.Event(), {}, []
+    sampler = threading.Thread(target=sample_rss, args=(pids, stop, peaks), daemon=True)
+    sampler.start()
+
+    cookie = f"access_token={args.access_token}"
+    deadline = time.monotonic() + args.duration
+    clients = [threading.Thread(target=client_loop, args=(args.url, cookie, deadline, results)) for _ in range(args.concurrency)]
+    started = time.monotonic()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.monotonic() - started
+    stop.set()
+
+    requests = sum(count for count, _ in results)
+    received = sum(size for _, size in results)
+    print(f"requests:     {requests}")
+    print(f"requests/sec: {requests / elapsed:.1f}")
+    print(f"MiB/sec:      {received / elapsed / 2**20:.1f}")
+    for pid in pids:
+        print(f"worker {pid}: peak RSS {peaks.get(pid, 0) / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
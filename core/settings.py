@@ -104,9 +104,32 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD', 'dein_passwort'),
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Seconds a connection is reused across requests (0 = a new connection per request)
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        # Check a reused connection before the request uses it (reconnects after a database restart)
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
     }
 }
 
+# Served through core/asgi.py (uvicorn, GUNICORN_WORKER_CLASS=uvicorn) or with the async HLS views enabled.
+ASGI_SERVER = os.environ.get('DJANGO_SERVER_INTERFACE') == 'asgi' or os.getenv('HLS_ASYNC_VIEWS', 'False') == 'True'
+
+# Persistent connections belong to a thread. Under ASGI the sync code runs in changing threads and would leave
+# connections behind, so they are always off there (Django's recommendation); use the pool instead.
+if ASGI_SERVER:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# psycopg 3 connection pool, one per worker process, instead of one persistent connection per thread.
+if os.environ.get('DB_POOL', 'False') == 'True':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        },
+    }
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
@@ -201,7 +224,97 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
 }
+# Seconds a user record stays in the cache after a successful authentication (dropped on every save of the user)
+JWT_USER_CACHE_TIMEOUT = int(os.getenv("JWT_USER_CACHE_TIMEOUT", 300))
+# Read-only endpoints (catalogue, HLS) build the user from the token claims instead of loading it;
+# a deactivated user keeps access to them until the access token expires
+JWT_TOKEN_USER_FOR_READS = os.getenv("JWT_TOKEN_USER_FOR_READS", "False") == "True"
 
 # Activate Media Serve
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+
+# HLS segment delivery
+# python:   segments are read and cached in-process (default, works without a reverse proxy)
+# sendfile: segments are streamed from an open file descriptor (os.sendfile via wsgi.file_wrapper)
+# accel:    only auth and path resolution run in Django, the web server streams the file
+HLS_DELIVERY_MODE = os.getenv("HLS_DELIVERY_MODE", "python")
+# Async playlist and segment views (run core.asgi:application under an ASGI server, e.g. uvicorn)
+HLS_ASYNC_VIEWS = os.getenv("HLS_ASYNC_VIEWS", "False") == "True"
+# X-Accel-Redirect (nginx) or X-Sendfile (Apache mod_xsendfile, lighttpd)
+HLS_ACCEL_HEADER = os.getenv("HLS_ACCEL_HEADER", "X-Accel-Redirect")
+# nginx `internal` location that maps to MEDIA_ROOT
+HLS_ACCEL_REDIRECT_PREFIX = os.getenv("HLS_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+
+# HLS transcoding
+# fanout:     one RQ job per rendition (spread over all rqworkers) plus a finalize job (default)
+# split:      the source is decoded once and all renditions are encoded in one ffmpeg pass
+# pool:       one ffmpeg process per rendition, HLS_TRANSCODE_WORKERS of them in parallel
+# sequential: one ffmpeg process per rendition, one after another
+HLS_TRANSCODE_MODE = os.getenv("HLS_TRANSCODE_MODE", "fanout")
+HLS_TRANSCODE_WORKERS = int(os.getenv("HLS_TRANSCODE_WORKERS", 0)) or os.cpu_count()
+# RQ timeout of a single rendition job in fanout mode (seconds)
+HLS_RENDITION_TIMEOUT = int(os.getenv("HLS_RENDITION_TIMEOUT", 900))
+
+# HLS encoding ladder: output size, capped bitrate (maxrate/bufsize, VBV) and audio bitrate per rendition
+HLS_ENCODING_LADDER = {
+    "480p": {"SIZE": "854:480", "MAXRATE": "1400k", "BUFSIZE": "2800k", "AUDIO_BITRATE": "96k"},
+    "720p": {"SIZE": "1280:720", "MAXRATE": "2800k", "BUFSIZE": "5600k", "AUDIO_BITRATE": "128k"},
+    "1080p": {"SIZE": "1920:1080", "MAXRATE": "5000k", "BUFSIZE": "10000k", "AUDIO_BITRATE": "160k"},
+}
+# x264 preset and CRF per encoding profile
+# fast:    quick first availability after the upload
+# quality: slower preset, used for the background re-encode (HLS_QUALITY_REENCODE)
+HLS_ENCODING_PROFILES = {
+    "fast": {"PRESET": "veryfast", "CRF": 23, "PROFILE": "main"},
+    "quality": {"PRESET": "slow", "CRF": 20, "PROFILE": "high"},
+}
+HLS_ENCODING_PROFILE = os.getenv("HLS_ENCODING_PROFILE", "fast")
+# Re-encode every video with the quality profile once the first encode is online
+HLS_QUALITY_REENCODE = os.getenv("HLS_QUALITY_REENCODE", "False") == "True"
+# Seconds the renditions replaced by the re-encode are kept for players that are still playing them
+HLS_SUPERSEDED_RENDITION_TTL = int(os.getenv("HLS_SUPERSEDED_RENDITION_TTL", 24 * 60 * 60))
+# Keyframe interval in seconds, the GOP length in frames is derived from the source frame rate
+HLS_GOP_SECONDS = int(os.getenv("HLS_GOP_SECONDS", 2))
+# Segment container of new encodes
+# mpegts: .ts segments (default, every HLS player)
+# fmp4:   CMAF, init.mp4 + .m4s segments (less muxing overhead, reusable for DASH; HLS version 7 players)
+HLS_SEGMENT_TYPE = os.getenv("HLS_SEGMENT_TYPE", "mpegts")
+# One media file per rendition (media.ts / media.m4s) addressed with EXT-X-BYTERANGE instead of one file per segment
+HLS_SINGLE_FILE = os.getenv("HLS_SINGLE_FILE", "False") == "True"
+
+# Signed segment URLs: the media playlists append an HMAC token (video, rendition, expiry) to every segment URI,
+# segment requests carrying a valid token skip the JWT cookie authentication and the user lookup.
+# TTL must cover a viewing session (VOD playlists are loaded once); expiries are rounded up to GRANULARITY
+# seconds so a playlist keeps its ETag within that window.
+HLS_SIGNED_URLS = {
+    "ENABLED": os.getenv("HLS_SIGNED_URLS_ENABLED", "True") == "True",
+    "TTL": int(os.getenv("HLS_SIGNED_URLS_TTL", 6 * 60 * 60)),
+    "GRANULARITY": 10 * 60,
+}
+
+# Seek previews: one tile every INTERVAL seconds, WIDTH pixels wide, COLUMNS x ROWS tiles per sprite sheet,
+# indexed by a WebVTT track next to the HLS output (media/hls/<id>/trickplay/)
+HLS_TRICKPLAY = {
+    "ENABLED": os.getenv("HLS_TRICKPLAY_ENABLED", "True") == "True",
+    "INTERVAL": int(os.getenv("HLS_TRICKPLAY_INTERVAL", 10)),
+    "WIDTH": int(os.getenv("HLS_TRICKPLAY_WIDTH", 160)),
+    "COLUMNS": 10,
+    "ROWS": 10,
+}
+
+# Responsive thumbnails: width variants of the uploaded thumbnail, created by an RQ job.
+# WebP with a JPEG fallback; AVIF is added with THUMBNAIL_AVIF=True (needs a Pillow build with libavif).
+THUMBNAIL_VARIANTS = {
+    "WIDTHS": [320, 640, 1280],
+    "FORMATS": ["webp", "jpeg"] + (["avif"] if os.getenv("THUMBNAIL_AVIF", "False") == "True" else []),
+    "QUALITY": int(os.getenv("THUMBNAIL_QUALITY", 80)),
+}
+
+# In-process LRU cache for HLS segments (python delivery mode), separate from the default cache alias.
+# A segment is cached after ADMIT_AFTER requests; the budget applies per worker process.
+HLS_SEGMENT_CACHE = {
+    "MAX_BYTES": int(os.getenv("HLS_SEGMENT_CACHE_MAX_BYTES", 128 * 1024 * 1024)),
+    "ADMIT_AFTER": int(os.getenv("HLS_SEGMENT_CACHE_ADMIT_AFTER", 2)),
+}
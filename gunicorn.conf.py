@@ -0,0 +1,101 @@
+"""
+Gunicorn configuration, loaded by backend.entrypoint.sh (gunicorn --config gunicorn.conf.py).
+
+Every value can be overridden with a GUNICORN_* environment variable (see .env.template). Worker classes:
+
+- sync     one request per process; slow clients hold a whole worker
+- gthread  GUNICORN_THREADS requests per process, keep-alive connections are kept open by the main thread
+- uvicorn  ASGI (core.asgi:application) via uvicorn-worker, for the async HLS views (HLS_ASYNC_VIEWS=True)
+"""
+
+import math, os
+
+
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"  # cgroup v2: "<quota> <period>" or "max <period>"
+CGROUP_V1_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"  # cgroup v1: -1 without a limit
+CGROUP_V1_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+WORKER_CLASSES = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "uvicorn": "uvicorn_worker.UvicornWorker",
+}
+
+
+def _cpu_count():
+    # CPUs this container may actually use, not the CPUs of the host: the affinity mask reflects cpusets,
+    # a CFS quota (docker --cpus, deploy.resources.limits.cpus) is only visible in the cgroup files.
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+def _cgroup_cpu_quota():
+    # CPUs granted by the CFS quota (e.g. 1.5), None without a limit or outside a cgroup.
+    try:
+        with open(CGROUP_CPU_MAX) as f:
+            quota, period = f.read().split()[:2]
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open(CGROUP_V1_QUOTA) as f:
+            quota = int(f.read())
+        with open(CGROUP_V1_PERIOD) as f:
+            period = int(f.read())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 and period > 0 else None
+
+
+def _default_workers(worker_class, cpus):
+    # Every process has its own segment cache (HLS_SEGMENT_CACHE_MAX_BYTES) and segment index LRU:
+    # fewer, larger processes keep more of the memory for cache hits.
+    if worker_class == "sync":
+        return 2 * cpus + 1  # no concurrency within a process
+    return cpus  # one event loop or thread pool per CPU
+
+
+worker_class_name = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+if worker_class_name not in WORKER_CLASSES:
+    raise ValueError(f"GUNICORN_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, got {worker_class_name!r}")
+
+wsgi_app = "core.asgi:application" if worker_class_name == "uvicorn" else "core.wsgi:application"
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+worker_class = WORKER_CLASSES[worker_class_name]
+workers = int(os.getenv("GUNICORN_WORKERS", "0")) or _default_workers(worker_class_name, _cpu_count())
+threads = int(os.getenv("GUNICORN_THREADS", "4")) if worker_class_name == "gthread" else 1
+
+# Recycling workers after a number of requests (plus jitter, so they don't all restart at once) caps slow memory
+# growth, but empties the per-process segment cache and segment index every time. Off by default; if needed,
+# use a limit far above the requests a worker serves in an hour of playback (every segment is a request).
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+# Idle seconds a client connection stays open between requests (players fetch a segment every few seconds).
+# The sync worker closes every connection after the response and ignores this.
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Uploads through the admin can take minutes; the conversion itself runs in the RQ worker.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "900"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+
+# Code reloading is for development only, it watches every imported file.
+reload = os.getenv("GUNICORN_RELOAD", "False") == "True"
+
+# Worker heartbeat files in memory instead of the (possibly overlay) container filesystem.
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
@@ -10,15 +10,18 @@ class VideoAdmin(admin.ModelAdmin):
     Display configuration of the video model in the Django admin.
     """
     
-    list_display = ('id', 'title', 'category', 'created_at', 'thumbnail_preview')
-    list_filter = ('category', 'created_at')
+    list_display = ('id', 'title', 'category', 'status', 'created_at', 'thumbnail_preview')
+    list_filter = ('category', 'status', 'created_at')
     search_fields = ('title', 'description', 'category')
-    readonly_fields = ('thumbnail_preview',)
+    readonly_fields = ('thumbnail_preview', 'status', *Video.PROBE_FIELDS)
     ordering = ('-created_at',)
-    fields = ('title', 'description', 'category', 'thumbnail_preview', 'thumbnail', 'video_file')
+    fields = ('title', 'description', 'category', 'thumbnail_preview', 'thumbnail', 'video_file', 'status', *Video.PROBE_FIELDS)
 
     def thumbnail_preview(self, obj):
         if obj.thumbnail:
-            return format_html(f'<img src="{obj.thumbnail.url}" width="80" height="50" style="object-fit:cover;" />')
+            # The smallest variant instead of the full-size upload, once it exists.
+            variants = obj.thumbnail_urls().get('jpeg', {})
+            url = variants[min(variants, key=int)] if variants else obj.thumbnail.url
+            return format_html('<img src="{}" width="80" height="50" style="object-fit:cover;" />', url)
         return "—"
     thumbnail_preview.short_description = 'Thumbnail'
@@ -0,0 +1,175 @@
+import asyncio, os
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed
+
+from auth_app.authentication import CookieJWTTokenUserAuthentication
+from video_app.cache_keys import avideo_meta, hls_master_cache_key, hls_playlist_cache_key
+from video_app.models import hls_base_dir
+from video_app.segment_cache import segment_cache
+from video_app.segment_index import SEGMENT_NAME_PATTERN, is_single_file, rendition_index, segment_validators
+from video_app.signing import SEGMENT_TOKEN_PARAM, sign_playlist, verify_segment_token
+from .streaming import DELIVERY_PYTHON, async_file_response, delivery_mode, memory_response
+from .views import (
+    HLS_PLAYLIST_CACHE_CONTROL, HLS_PLAYLIST_CACHE_TIMEOUT, HLS_SEGMENT_CACHE_CONTROL, HLS_SEGMENT_CONTENT_TYPES, is_rendition, read_playlist,
+)
+
+
+async def authenticate(request):
+    """
+    Cookie JWT check of the DRF views for plain async views. Returns the 401 response, or None if authenticated.
+    """
+
+    try:
+        result = await sync_to_async(CookieJWTTokenUserAuthentication().authenticate)(request)
+    except AuthenticationFailed as error:
+        return _unauthorized(str(error.detail))
+    if result is None:
+        return _unauthorized("Authentication credentials were not provided.")
+    return None
+
+
+class AsyncVideoHLSView(View):
+    """
+    GET /api/video/<int:movie_id>/<str:resolution>/index.m3u8 (HLS_ASYNC_VIEWS, served by an ASGI server)
+    Same responses as VideoHLSView, with async cache access and the file read in a worker thread.
+    """
+
+    async def get(self, request, movie_id, resolution):
+        denied = await authenticate(request)
+        if denied:
+            return denied
+
+        if not is_rendition(resolution):
+            return _not_found(f"HLS for {resolution} not found.")
+
+        video = await avideo_meta(movie_id)
+        if video is None:
+            return _not_found("No Video matches the given query.")
+
+        cache_key = hls_playlist_cache_key(movie_id, resolution, video["version"])
+        playlist = await self._cached_playlist(os.path.join(hls_base_dir(movie_id), resolution, "index.m3u8"), cache_key)
+        if playlist is None:
+            return _not_found(f"HLS for {resolution} not found.")
+
+        if settings.HLS_SIGNED_URLS["ENABLED"]:
+            playlist = sign_playlist(playlist, movie_id, resolution)
+        return self._playlist_response(request, playlist)
+
+    async def _cached_playlist(self, playlist_path, cache_key):
+        playlist = await cache.aget(cache_key)
+        if playlist:
+            return playlist
+
+        playlist = await asyncio.to_thread(read_playlist, playlist_path)
+        if playlist is not None:
+            await cache.aset(cache_key, playlist, timeout=HLS_PLAYLIST_CACHE_TIMEOUT)
+        return playlist
+
+    def _playlist_response(self, request, playlist):
+        return memory_response(
+            request, playlist["data"], content_type="application/vnd.apple.mpegurl", filename="",
+            etag=playlist["etag"], last_modified=playlist["last_modified"], cache_control=HLS_PLAYLIST_CACHE_CONTROL,
+        )
+
+
+class AsyncVideoHLSMasterView(AsyncVideoHLSView):
+    """
+    GET /api/video/<int:movie_id>/master.m3u8 (HLS_ASYNC_VIEWS)
+    """
+
+    async def get(self, request, movie_id):
+        denied = await authenticate(request)
+        if denied:
+            return denied
+
+        video = await avideo_meta(movie_id)
+        if video is None:
+            return _not_found("No Video matches the given query.")
+
+        cache_key = hls_master_cache_key(movie_id, video["version"])
+        playlist = await self._cached_playlist(os.path.join(hls_base_dir(movie_id), "master.m3u8"), cache_key)
+        if playlist is None:
+            return _not_found("HLS master playlist not found.")
+        return self._playlist_response(request, playlist)
+
+
+class AsyncVideoHLSSegmentView(View):
+    """
+    GET /api/video/<int:movie_id>/<str:resolution>/<str:segment>/ (HLS_ASYNC_VIEWS)
+    Same lookup, caching and delivery modes as VideoHLSSegmentView. Files are streamed chunk by chunk from a
+    worker thread, so thousands of slow clients can share one process instead of holding a sync worker each.
+    """
+
+    async def get(self, request, movie_id, resolution, segment):
+        token = request.GET.get(SEGMENT_TOKEN_PARAM)
+        if not (token and verify_segment_token(token, movie_id, resolution)):
+            denied = await authenticate(request)
+            if denied:
+                return denied
+
+        if not is_rendition(resolution) or not SEGMENT_NAME_PATTERN.fullmatch(segment):
+            return _not_found("Segment not found")
+
+        video = await avideo_meta(movie_id)
+        if video is None:
+            return _not_found("No Video matches the given query.")
+
+        index = await asyncio.to_thread(rendition_index, movie_id, resolution, video["version"])
+        if index is None or segment not in index["files"]:
+            return _not_found("Segment not found")
+
+        segment_path = os.path.join(hls_base_dir(movie_id), resolution, segment)
+        if delivery_mode() != DELIVERY_PYTHON or is_single_file(segment):
+            return await self._file_response(request, segment_path, segment, index)
+
+        return await self._cached_segment(request, segment_path, f"{movie_id}/{resolution}/{segment}", segment, index)
+
+    async def _cached_segment(self, request, segment_path, cache_key, segment, index):
+        etag, last_modified = segment_validators(index, segment)
+        cached_data = segment_cache.get(cache_key, etag)
+        if cached_data:
+            return self._segment_response(request, cached_data, segment)
+
+        if not segment_cache.admit(cache_key, index["files"][segment]):
+            return await self._file_response(request, segment_path, segment, index)
+
+        data = await asyncio.to_thread(_read_file, segment_path)
+        segment_cache.set(cache_key, data, etag, last_modified)
+
+        return self._segment_response(request, {"data": data, "etag": etag, "last_modified": last_modified}, segment)
+
+    async def _file_response(self, request, segment_path, segment, index):
+        return await async_file_response(
+            request, segment_path, content_type=_content_type(segment), filename=segment, cache_control=HLS_SEGMENT_CACHE_CONTROL,
+            validators=segment_validators(index, segment), size=index["files"][segment],
+        )
+
+    def _segment_response(self, request, cached_data, segment):
+        return memory_response(
+            request, cached_data["data"], content_type=_content_type(segment), filename=segment,
+            etag=cached_data["etag"], last_modified=cached_data["last_modified"], cache_control=HLS_SEGMENT_CACHE_CONTROL,
+        )
+
+
+def _content_type(segment):
+    return HLS_SEGMENT_CONTENT_TYPES[os.path.splitext(segment)[1]]
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _not_found(detail):
+    return JsonResponse({"detail": detail}, status=404)
+
+
+def _unauthorized(detail):
+    response = JsonResponse({"detail": detail}, status=401)
+    response["WWW-Authenticate"] = 'Bearer realm="api"'
+    return response
@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class VideoCursorPagination(CursorPagination):
+    """
+    Stable cursor pagination over the newest videos (created_at, id), backed by the (category,) created_at indexes.
+    """
+
+    ordering = ('-created_at', '-id')
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,17 @@
+from rest_framework.permissions import BasePermission
+
+from video_app.signing import SEGMENT_TOKEN_PARAM, verify_segment_token
+
+
+class HasSegmentTokenOrIsAuthenticated(BasePermission):
+    """
+    Segment requests with a valid signed URL (issued by the media playlist) are allowed after a single HMAC check.
+    Without a token, or with an expired one, the JWT cookie is checked as usual.
+    The view has to leave authentication lazy (perform_authentication), otherwise the cookie is always decoded.
+    """
+
+    def has_permission(self, request, view):
+        token = request.query_params.get(SEGMENT_TOKEN_PARAM)
+        if token and verify_segment_token(token, view.kwargs["movie_id"], view.kwargs["resolution"]):
+            return True
+        return bool(request.user and request.user.is_authenticated)
@@ -9,14 +9,28 @@ class VideoSerializer(serializers.ModelSerializer):
     """
     
     thumbnail_url = serializers.SerializerMethodField()
+    thumbnail_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Video
-        fields = ['id', 'created_at', 'title', 'description', 'thumbnail_url', 'category']
+        fields = ['id', 'created_at', 'title', 'description', 'thumbnail_url', 'thumbnail_srcset', 'category']
 
     def get_thumbnail_url(self, obj):
         request = self.context.get('request')
         
         if obj.thumbnail:
-            return request.build_absolute_uri(obj.thumbnail.url)
+            # Without a request (materialized catalogue rows) the URL stays relative.
+            return request.build_absolute_uri(obj.thumbnail.url) if request else obj.thumbnail.url
         return None
+
+    def get_thumbnail_srcset(self, obj):
+        """
+        {format: {width: URL}} of the resized thumbnails, e.g. {"webp": {"320": ..., "640": ...}, "jpeg": {...}}.
+        Empty until the background job has created them.
+        """
+
+        request = self.context.get('request')
+        return {
+            file_format: {width: request.build_absolute_uri(url) if request else url for width, url in urls.items()}
+            for file_format, urls in obj.thumbnail_urls().items()
+        }
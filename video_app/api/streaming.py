@@ -0,0 +1,255 @@
+import asyncio, io, os, re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+
+DELIVERY_PYTHON = "python"      # read into memory, cache in the per-process SegmentCache
+DELIVERY_SENDFILE = "sendfile"  # stream from an open file descriptor (os.sendfile via wsgi.file_wrapper)
+DELIVERY_ACCEL = "accel"        # hand off to the web server (X-Accel-Redirect / X-Sendfile)
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+ASYNC_CHUNK_SIZE = 256 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class RangeFile:
+    """
+    Read-only window [start, start + length) on an open file.
+    fileno() is kept so gunicorn can still use os.sendfile(), bounded by Content-Length.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self._file = file
+        self._remaining = length
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+
+
+def delivery_mode():
+    return getattr(settings, "HLS_DELIVERY_MODE", DELIVERY_PYTHON)
+
+
+def file_validators(path):
+    """
+    Strong ETag from file size and mtime plus the Last-Modified timestamp.
+    """
+
+    stat = os.stat(path)
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"', int(stat.st_mtime)
+
+
+def file_response(request, path, content_type, filename, cache_control, validators=None, size=None):
+    """
+    Delivers a file from MEDIA_ROOT without reading it into Python memory.
+    In accel mode only headers are sent and the web server streams the body (and handles Range).
+    validators (etag, last_modified) and size skip the stat() when the caller already knows them.
+    """
+
+    etag, last_modified = validators or file_validators(path)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return _with_validators(not_modified, etag, last_modified, cache_control)
+
+    if delivery_mode() == DELIVERY_ACCEL:
+        return _with_validators(_accel_response(path, content_type), etag, last_modified, cache_control)
+
+    if size is None:
+        size = os.path.getsize(path)
+    try:
+        byte_range = _requested_range(request, size, etag, last_modified)
+    except RangeNotSatisfiable:
+        return _range_not_satisfiable(size)
+
+    # gunicorn and most WSGI servers hand the open file to os.sendfile() via wsgi.file_wrapper.
+    if byte_range is None:
+        response = FileResponse(open(path, "rb"), content_type=content_type, filename=filename)
+    else:
+        start, end = byte_range
+        response = FileResponse(RangeFile(open(path, "rb"), start, end - start + 1), content_type=content_type, filename=filename)
+        _make_partial(response, start, end, size)
+
+    return _with_validators(response, etag, last_modified, cache_control)
+
+
+def bytes_response(request, data, content_type, filename, etag, last_modified, cache_control):
+    """
+    Delivers cached bytes with the same conditional and Range handling as file_response().
+    """
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return _with_validators(not_modified, etag, last_modified, cache_control)
+
+    size = len(data)
+    try:
+        byte_range = _requested_range(request, size, etag, last_modified)
+    except RangeNotSatisfiable:
+        return _range_not_satisfiable(size)
+
+    if byte_range is None:
+        response = FileResponse(io.BytesIO(data), content_type=content_type, filename=filename)
+    else:
+        start, end = byte_range
+        response = FileResponse(io.BytesIO(data[start:end + 1]), content_type=content_type, filename=filename)
+        _make_partial(response, start, end, size)
+
+    return _with_validators(response, etag, last_modified, cache_control)
+
+
+async def async_file_response(request, path, content_type, filename, cache_control, validators=None, size=None):
+    """
+    ASGI variant of file_response(): the file is read chunk by chunk in a worker thread, so a slow client
+    only holds a suspended coroutine instead of a whole worker.
+    """
+
+    etag, last_modified = validators or await asyncio.to_thread(file_validators, path)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return _with_validators(not_modified, etag, last_modified, cache_control)
+
+    if delivery_mode() == DELIVERY_ACCEL:
+        return _with_validators(_accel_response(path, content_type), etag, last_modified, cache_control)
+
+    if size is None:
+        size = await asyncio.to_thread(os.path.getsize, path)
+    try:
+        byte_range = _requested_range(request, size, etag, last_modified)
+    except RangeNotSatisfiable:
+        return _range_not_satisfiable(size)
+
+    start, end = byte_range or (0, size - 1)
+    response = StreamingHttpResponse(_read_chunks(path, start, end - start + 1), content_type=content_type)
+    response["Content-Length"] = str(end - start + 1)
+    response["Content-Disposition"] = content_disposition_header(False, filename)
+    if byte_range is not None:
+        _make_partial(response, start, end, size)
+
+    return _with_validators(response, etag, last_modified, cache_control)
+
+
+def memory_response(request, data, content_type, filename, etag, last_modified, cache_control):
+    """
+    Like bytes_response(), but a plain HttpResponse: under ASGI there is no iterator to consume in a thread.
+    """
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return _with_validators(not_modified, etag, last_modified, cache_control)
+
+    size = len(data)
+    try:
+        byte_range = _requested_range(request, size, etag, last_modified)
+    except RangeNotSatisfiable:
+        return _range_not_satisfiable(size)
+
+    start, end = byte_range or (0, size - 1)
+    response = HttpResponse(data[start:end + 1], content_type=content_type)
+    if filename:
+        response["Content-Disposition"] = content_disposition_header(False, filename)
+    if byte_range is not None:
+        _make_partial(response, start, end, size)
+
+    return _with_validators(response, etag, last_modified, cache_control)
+
+
+def _requested_range(request, size, etag, last_modified):
+    """
+    Returns (start, end) of a single satisfiable byte range, or None to send the full body.
+    Multiple ranges and malformed headers are ignored (RFC 9110 allows a full 200 response).
+    """
+
+    header = request.META.get("HTTP_RANGE", "").strip()
+    match = RANGE_RE.match(header)
+    if not match or not _if_range_passes(request, etag, last_modified):
+        return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        return None
+
+    if start >= size or size == 0:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def _if_range_passes(request, etag, last_modified):
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _make_partial(response, start, end, size):
+    response.status_code = 206
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(end - start + 1)
+
+
+def _range_not_satisfiable(size):
+    response = HttpResponse(status=416)
+    response["Content-Range"] = f"bytes */{size}"
+    return response
+
+
+def _with_validators(response, etag, last_modified, cache_control):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = cache_control
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+async def _read_chunks(path, start, length):
+    file = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(file.seek, start)
+        while length > 0:
+            chunk = await asyncio.to_thread(file.read, min(ASYNC_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def _accel_response(path, content_type):
+    response = HttpResponse(content_type=content_type)
+    header = settings.HLS_ACCEL_HEADER
+
+    if header.lower() == "x-accel-redirect":
+        relative_path = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, "/")
+        response[header] = settings.HLS_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + relative_path
+    else:
+        response[header] = path
+
+    return response
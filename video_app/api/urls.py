@@ -1,10 +1,22 @@
+from django.conf import settings
 from django.urls import path
 
-from .views import VideoView, VideoHLSView, VideoHLSSegmentView
+from .async_views import AsyncVideoHLSMasterView, AsyncVideoHLSSegmentView, AsyncVideoHLSView
+from .views import VideoView, VideoRowsView, VideoHLSView, VideoHLSMasterView, VideoHLSSegmentView, VideoTrickplayView, VideoStatusView, SegmentCacheStatsView
+
+
+# Under an ASGI server (core.asgi) the streaming endpoints can run as async views.
+if settings.HLS_ASYNC_VIEWS:
+    VideoHLSView, VideoHLSMasterView, VideoHLSSegmentView = AsyncVideoHLSView, AsyncVideoHLSMasterView, AsyncVideoHLSSegmentView
 
 
 urlpatterns = [
     path('', VideoView.as_view(), name='video'),
+    path('rows/', VideoRowsView.as_view(), name='video_rows'),
+    path('segment-cache/', SegmentCacheStatsView.as_view(), name='segment_cache_stats'),
+    path('<int:movie_id>/status/', VideoStatusView.as_view(), name='video_status'),
+    path('<int:movie_id>/trickplay/<str:name>', VideoTrickplayView.as_view(), name='video_trickplay'),
+    path('<int:movie_id>/master.m3u8', VideoHLSMasterView.as_view(), name="video_hls_master"),
     path('<int:movie_id>/<str:resolution>/index.m3u8', VideoHLSView.as_view(), name="video_hls"),
     path('<int:movie_id>/<str:resolution>/<str:segment>/', VideoHLSSegmentView.as_view(), name="video_hls_segment")
 ]
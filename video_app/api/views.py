@@ -1,100 +1,315 @@
-import io, os
+import os, re
 
+from django.conf import settings
 from django.core.cache import cache
-from django.http import FileResponse, StreamingHttpResponse
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.generics import ListAPIView
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from video_app.models import Video
+from auth_app.authentication import CookieJWTTokenUserAuthentication
+from video_app.cache_keys import hls_master_cache_key, hls_playlist_cache_key, video_list_cache_key, video_meta
+from video_app.catalogue import get_rows
+from video_app.manifest import read_manifest, rendition_resolution
+from video_app.models import Video, hls_base_dir
+from video_app.progress import get_progress
+from video_app.segment_cache import segment_cache
+from video_app.segment_index import SEGMENT_NAME_PATTERN, is_single_file, rendition_index, segment_validators
+from video_app.signing import sign_playlist
+from video_app.tasks import RESOLUTIONS, TRICKPLAY_DIR, TRICKPLAY_VTT_NAME
+from .pagination import VideoCursorPagination
+from .permissions import HasSegmentTokenOrIsAuthenticated
 from .serializers import VideoSerializer
+from .streaming import DELIVERY_PYTHON, bytes_response, delivery_mode, file_response, file_validators
 
 
 VIDEO_LIST_CACHE_TIMEOUT = 60 * 60        # 1 hour
 HLS_PLAYLIST_CACHE_TIMEOUT = 6 * 60 * 60  # 6 hours
-HLS_SEGMENT_CACHE_TIMEOUT = 12 * 60 * 60  # 12 hours
+
+# Browsers revalidate playlists and segments with the ETag (cheap 304). Segment and sprite URLs are not unique
+# per encode (a new video_file is encoded to the same names), so they must not be cached without revalidation.
+HLS_PLAYLIST_CACHE_CONTROL = "private, no-cache"
+HLS_SEGMENT_CACHE_CONTROL = "private, no-cache"
+
+# MPEG-TS segments and CMAF (fMP4) init/media segments; only names listed in the segment index are served.
+HLS_SEGMENT_CONTENT_TYPES = {".ts": "video/MP2T", ".m4s": "video/iso.segment", ".mp4": "video/mp4"}
+TRICKPLAY_SPRITE_PATTERN = re.compile(r"sprite_\d{3}\.jpg")
+
+
+def get_video_meta_or_404(movie_id):
+    """
+    Cached replacement for get_object_or_404(Video, ...) in the streaming views (no DB query on a cache hit).
+    """
+
+    video = video_meta(movie_id)
+    if video is None:
+        raise Http404("No Video matches the given query.")
+    return video
+
+
+def is_rendition(name):
+    """
+    The rendition part of a playlist or segment URL: a directory name of the ladder ("720p", or "720p.<revision>"
+    after a re-encode). Checked before any filesystem access, hidden work directories are never served.
+    """
+
+    return rendition_resolution(name) in RESOLUTIONS
+
+
+def read_playlist(playlist_path):
+    """
+    {"data", "etag", "last_modified"} of a playlist file as it is cached, or None if it does not exist (yet).
+    """
+
+    if not os.path.exists(playlist_path):
+        return None
+
+    with open(playlist_path, "rb") as f:
+        data = f.read()
+    etag, last_modified = file_validators(playlist_path)
+    return {"data": data, "etag": etag, "last_modified": last_modified}
 
 
 class VideoView(ListAPIView):
     """
-    GET /api/video/
-    Returns a list of all available videos (cached).
+    GET /api/video/?category=<category>&cursor=<cursor>&page_size=<n>
+    Returns the newest videos page by page, optionally filtered by category (cached per page and category).
     """
-    
+
+    authentication_classes = [CookieJWTTokenUserAuthentication]
     serializer_class = VideoSerializer
+    pagination_class = VideoCursorPagination
 
     def get_queryset(self):
-        return Video.objects.all().order_by('-created_at')
+        queryset = Video.objects.all()
+
+        category = self.request.query_params.get('category')
+        if category:
+            queryset = queryset.filter(category=category)
+        return queryset
     
     def list(self, request, *args, **kwargs):
-        cache_key = "video_list"
+        params = request.query_params
+        cache_key = video_list_cache_key(params.get('category'), params.get('cursor'), params.get('page_size'))
         cached_data = cache.get(cache_key)
         if cached_data:
             return Response(cached_data)
 
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        data = serializer.data
+        response = super().list(request, *args, **kwargs)
+
+        cache.set(cache_key, response.data, timeout=VIDEO_LIST_CACHE_TIMEOUT)
+        return response
+
+
+class VideoRowsView(APIView):
+    """
+    GET /api/video/rows/
+    Returns the catalogue grouped by category with the newest videos per category.
+    The rows are materialized in the cache and updated by the video signals.
+    """
+
+    authentication_classes = [CookieJWTTokenUserAuthentication]
+
+    def get(self, request):
+        rows = get_rows()
+        return Response([
+            {"category": category, "videos": [self._with_absolute_thumbnail(request, video) for video in videos]}
+            for category, videos in sorted(rows.items())
+        ])
 
-        cache.set(cache_key, data, timeout=VIDEO_LIST_CACHE_TIMEOUT)
-        return Response(data)
+    def _with_absolute_thumbnail(self, request, video):
+        if not video["thumbnail_url"]:
+            return video
+        return {
+            **video,
+            "thumbnail_url": request.build_absolute_uri(video["thumbnail_url"]),
+            "thumbnail_srcset": {
+                file_format: {width: request.build_absolute_uri(url) for width, url in urls.items()}
+                for file_format, urls in video.get("thumbnail_srcset", {}).items()
+            },
+        }
 
 
 class VideoHLSView(APIView):
     """
     GET /api/video/<int:movie_id>/<str:resolution>/index.m3u8
-    Returns the HLS playlist for a video in a specific resolution (cached).
+    Returns the HLS playlist for a video in a specific resolution (cached, supports ETag / If-Modified-Since).
+    With HLS_SIGNED_URLS the segment URIs carry a signed token, so the segment requests skip the JWT check.
     """
 
+    authentication_classes = [CookieJWTTokenUserAuthentication]
+
     def get(self, request, movie_id, resolution):
-        video = get_object_or_404(Video, id=movie_id)
+        if not is_rendition(resolution):
+            return Response({"detail": f"HLS for {resolution} not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        cache_key = f"hls_playlist_{movie_id}_{resolution}"
+        video = get_video_meta_or_404(movie_id)
+
+        cache_key = hls_playlist_cache_key(movie_id, resolution, video["version"])
+        playlist_path = os.path.join(hls_base_dir(movie_id), resolution, "index.m3u8")
+        playlist = self._cached_playlist(playlist_path, cache_key)
+        if playlist is None:
+            return Response({"detail": f"HLS for {resolution} not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        if settings.HLS_SIGNED_URLS["ENABLED"]:
+            playlist = sign_playlist(playlist, movie_id, resolution)
+        return self._playlist_response(request, playlist)
+
+    def _cached_playlist(self, playlist_path, cache_key):
         cached_data = cache.get(cache_key)
         if cached_data:
-            return StreamingHttpResponse(cached_data, content_type="application/vnd.apple.mpegurl")
-        
-        return self._load_and_cache(video, resolution, cache_key)
+            return cached_data
 
-    def _load_and_cache(self, video, resolution, cache_key):
-        playlist_path = os.path.join(video.base_dir, resolution, "index.m3u8")
-        if not os.path.exists(playlist_path):
-            return Response({"detail": f"HLS for {resolution} not found."}, status=status.HTTP_404_NOT_FOUND)
+        return self._load_and_cache(playlist_path, cache_key)
 
-        with open(playlist_path, "r") as f:
-            data = f.read()
+    def _load_and_cache(self, playlist_path, cache_key):
+        cached_data = read_playlist(playlist_path)
+        if cached_data is not None:
+            cache.set(cache_key, cached_data, timeout=HLS_PLAYLIST_CACHE_TIMEOUT)
+        return cached_data
+
+    def _playlist_response(self, request, cached_data):
+        return bytes_response(
+            request, cached_data["data"], content_type="application/vnd.apple.mpegurl", filename="",
+            etag=cached_data["etag"], last_modified=cached_data["last_modified"], cache_control=HLS_PLAYLIST_CACHE_CONTROL,
+        )
+
+
+class VideoHLSMasterView(VideoHLSView):
+    """
+    GET /api/video/<int:movie_id>/master.m3u8
+    Returns the master playlist that lists the finished renditions with their measured bitrates (cached).
+    """
 
-        cache.set(cache_key, data, timeout=HLS_PLAYLIST_CACHE_TIMEOUT)
+    def get(self, request, movie_id):
+        video = get_video_meta_or_404(movie_id)
 
-        return StreamingHttpResponse(data, content_type="application/vnd.apple.mpegurl")
+        cache_key = hls_master_cache_key(movie_id, video["version"])
+        playlist_path = os.path.join(hls_base_dir(movie_id), "master.m3u8")
+        playlist = self._cached_playlist(playlist_path, cache_key)
+        if playlist is None:
+            return Response({"detail": "HLS master playlist not found."}, status=status.HTTP_404_NOT_FOUND)
+        return self._playlist_response(request, playlist)
 
 
 class VideoHLSSegmentView(APIView):
     """
     GET /api/video/<int:movie_id>/<str:resolution>/<str:segment>/
-    Delivers a single HLS segment for a video at a specific resolution (cached).
+    Delivers a single HLS segment (.ts, or .m4s / init.mp4 for CMAF) for a video at a specific resolution
+    (supports Range and conditional GET).
+    Depending on HLS_DELIVERY_MODE popular segments are kept in the in-process segment cache,
+    streamed via sendfile or handed off to the web server.
+    Names and sizes come from the cached segment index of the rendition: no stat() per request.
+    Single-file renditions (HLS_SINGLE_FILE) are requested by byte range and always streamed from the file.
+    Requests with a signed token from the media playlist are not authenticated via the JWT cookie.
     """
 
+    authentication_classes = [CookieJWTTokenUserAuthentication]
+    permission_classes = [HasSegmentTokenOrIsAuthenticated]
+
+    def perform_authentication(self, request):
+        # Lazy: request.user (JWT decode + user query) is only resolved if the permission needs it.
+        pass
+
     def get(self, request, movie_id, resolution, segment):
-        video = get_object_or_404(Video, id=movie_id)
-        cache_key = f"hls_segment_{video.id}_{resolution}_{segment}"
+        if not is_rendition(resolution) or not SEGMENT_NAME_PATTERN.fullmatch(segment):
+            return Response({"detail": "Segment not found"}, status=404)
 
-        cached_data = cache.get(cache_key)
+        video = get_video_meta_or_404(movie_id)
+        index = rendition_index(movie_id, resolution, video["version"])
+        if index is None or segment not in index["files"]:
+            return Response({"detail": "Segment not found"}, status=404)
+
+        segment_path = os.path.join(hls_base_dir(movie_id), resolution, segment)
+        if delivery_mode() != DELIVERY_PYTHON or is_single_file(segment):
+            return self._file_response(request, segment_path, segment, index)
+
+        return self._cached_segment(request, segment_path, f"{movie_id}/{resolution}/{segment}", segment, index)
+
+    def _cached_segment(self, request, segment_path, cache_key, segment, index):
+        etag, last_modified = segment_validators(index, segment)
+        cached_data = segment_cache.get(cache_key, etag)
         if cached_data:
-            return FileResponse(io.BytesIO(cached_data), content_type="video/MP2T", filename=segment)
+            return self._segment_response(request, cached_data, segment)
+
+        if not segment_cache.admit(cache_key, index["files"][segment]):
+            return self._file_response(request, segment_path, segment, index)
 
-        return self._load_and_cache(video, resolution, segment, cache_key)
-    
-    def _load_and_cache(self, video, resolution, segment, cache_key):
-        segment_path = os.path.join(video.base_dir, resolution, segment)
-        if not os.path.exists(segment_path):
-            return Response({"detail": "Segment not found"}, status=404)
-    
         with open(segment_path, "rb") as f:
             data = f.read()
-    
-        cache.set(cache_key, data, timeout=HLS_SEGMENT_CACHE_TIMEOUT)
-    
-        return FileResponse(io.BytesIO(data), content_type="video/MP2T", filename=segment)
+        segment_cache.set(cache_key, data, etag, last_modified)
+
+        return self._segment_response(request, {"data": data, "etag": etag, "last_modified": last_modified}, segment)
+
+    def _file_response(self, request, segment_path, segment, index):
+        return file_response(
+            request, segment_path, content_type=self._content_type(segment), filename=segment, cache_control=HLS_SEGMENT_CACHE_CONTROL,
+            validators=segment_validators(index, segment), size=index["files"][segment],
+        )
+
+    def _segment_response(self, request, cached_data, segment):
+        return bytes_response(
+            request, cached_data["data"], content_type=self._content_type(segment), filename=segment,
+            etag=cached_data["etag"], last_modified=cached_data["last_modified"], cache_control=HLS_SEGMENT_CACHE_CONTROL,
+        )
+
+    def _content_type(self, segment):
+        return HLS_SEGMENT_CONTENT_TYPES[os.path.splitext(segment)[1]]
+
+
+class VideoTrickplayView(APIView):
+    """
+    GET /api/video/<int:movie_id>/trickplay/thumbnails.vtt
+    GET /api/video/<int:movie_id>/trickplay/sprite_<n>.jpg
+    Delivers the seek preview track and its sprite sheets (the cue URLs in the track are relative).
+    """
+
+    authentication_classes = [CookieJWTTokenUserAuthentication]
+
+    def get(self, request, movie_id, name):
+        get_video_meta_or_404(movie_id)
+        if name == TRICKPLAY_VTT_NAME:
+            content_type = "text/vtt"
+        elif TRICKPLAY_SPRITE_PATTERN.fullmatch(name):
+            content_type = "image/jpeg"
+        else:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        path = os.path.join(hls_base_dir(movie_id), TRICKPLAY_DIR, name)
+        if not os.path.exists(path):
+            return Response({"detail": "Trickplay not found."}, status=status.HTTP_404_NOT_FOUND)
+        return file_response(request, path, content_type=content_type, filename=name, cache_control=HLS_SEGMENT_CACHE_CONTROL)
+
+
+class VideoStatusView(APIView):
+    """
+    GET /api/video/<int:movie_id>/status/
+    Returns the conversion status of a video, the published renditions and the progress (percent, fps, ETA)
+    per rendition. "playable" turns true as soon as the first rendition is in master.m3u8, while the status
+    is still "processing". Not cached: the status is written by the RQ jobs and polled by the frontend.
+    """
+
+    authentication_classes = [CookieJWTTokenUserAuthentication]
+
+    def get(self, request, movie_id):
+        video = get_object_or_404(Video.objects.values('id', 'status'), pk=movie_id)
+        base_dir = hls_base_dir(movie_id)
+        published = read_manifest(base_dir)["renditions"]
+        renditions = [res for res in RESOLUTIONS if res in published]
+        playable = bool(renditions) and os.path.exists(os.path.join(base_dir, "master.m3u8"))
+        return Response({**video, "renditions": renditions, "playable": playable, "progress": get_progress(movie_id, RESOLUTIONS)})
+
+
+class SegmentCacheStatsView(APIView):
+    """
+    GET /api/video/segment-cache/
+    Returns the hit/miss/eviction counters of the segment cache of the worker process that answers (admin only).
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(segment_cache.stats())
@@ -0,0 +1,150 @@
+import hashlib, time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from .models import Video
+
+
+CATALOGUE_VERSION_KEY = "video_list_version"
+VIDEO_META_CACHE_TIMEOUT = 60 * 60  # 1 hour
+# Category generations expire: the category comes from the query string, so clients can create any number of them.
+# An expired generation restarts from the clock and never revives old pages.
+CATEGORY_VERSION_TIMEOUT = 24 * 60 * 60  # 1 day
+
+
+def video_list_cache_key(category=None, cursor=None, page_size=None):
+    """
+    One entry per page and category. A category has its own generation, so an upload
+    only invalidates the pages of its category and the unfiltered catalogue.
+    """
+
+    if category:
+        digest = hashlib.md5(category.encode()).hexdigest()[:12]
+        prefix = f"video_list_{digest}_v{_version(_category_version_key(category), CATEGORY_VERSION_TIMEOUT)}"
+    else:
+        prefix = f"video_list_v{catalogue_version()}"
+    return f"{prefix}_{cursor or ''}_{page_size or ''}"
+
+
+def rows_categories_cache_key(version):
+    return f"video_rows_categories_v{version}"
+
+
+def rows_cache_key(category, version):
+    return f"video_rows_{hashlib.md5(category.encode()).hexdigest()[:12]}_v{version}"
+
+
+def catalogue_version():
+    return _version(CATALOGUE_VERSION_KEY)
+
+
+def category_versions(categories):
+    """
+    {category: generation} of the given categories, the known ones in a single cache round trip.
+    """
+
+    keys = {category: _category_version_key(category) for category in categories}
+    cached = cache.get_many(list(keys.values()))
+    return {
+        category: cached[key] if key in cached else _version(key, CATEGORY_VERSION_TIMEOUT)
+        for category, key in keys.items()
+    }
+
+
+def hls_playlist_cache_key(video_id, resolution, version=None):
+    return f"hls_playlist_{video_id}_v{version or video_version(video_id)}_{resolution}"
+
+
+def hls_master_cache_key(video_id, version=None):
+    return f"hls_master_{video_id}_v{version or video_version(video_id)}"
+
+
+def video_meta(video_id):
+    """
+    Cached existence check for the streaming views: {"id", "version"} or None if there is no such video.
+    The entry only stores whether the video exists; the version is read from its own key in the same round trip,
+    so a publish (version bump) can never be shadowed by an entry written with the version before it.
+    A hit costs one cache GET_MANY and no database query; misses for unknown ids are cached too.
+    """
+
+    meta_key, version_key = _video_meta_key(video_id), _video_version_key(video_id)
+    cached = cache.get_many([meta_key, version_key])
+    exists = cached.get(meta_key)
+    if exists is None:
+        exists = Video.objects.filter(pk=video_id).exists()
+        cache.set(meta_key, exists, timeout=VIDEO_META_CACHE_TIMEOUT)
+    if not exists:
+        return None
+
+    version = cached.get(version_key)
+    return {"id": video_id, "version": version if version is not None else video_version(video_id)}
+
+
+async def avideo_meta(video_id):
+    """
+    video_meta() for the async views: the hit path is a single async cache GET_MANY.
+    """
+
+    meta_key, version_key = _video_meta_key(video_id), _video_version_key(video_id)
+    cached = await cache.aget_many([meta_key, version_key])
+    if cached.get(meta_key) is None or cached.get(version_key) is None:
+        return await sync_to_async(video_meta)(video_id)
+    return {"id": video_id, "version": cached[version_key]} if cached[meta_key] else None
+
+
+def video_version(video_id):
+    return _version(_video_version_key(video_id))
+
+
+def invalidate_video(video_id, *categories):
+    """
+    O(1) invalidation: bumps the generation of the video, the catalogue and the given categories.
+    Entries stored under the old generation are never read again and expire through their TTL.
+    """
+
+    invalidate_hls(video_id)
+    cache.delete(_video_meta_key(video_id))
+    _bump(CATALOGUE_VERSION_KEY)
+    for category in set(filter(None, categories)):
+        _bump(_category_version_key(category), CATEGORY_VERSION_TIMEOUT)
+
+
+def invalidate_hls(video_id):
+    """
+    Only the playlists of the video changed (e.g. a rendition was published): the catalogue stays cached.
+    """
+
+    _bump(_video_version_key(video_id))
+
+
+def _video_meta_key(video_id):
+    return f"video_meta_{video_id}"
+
+
+def _video_version_key(video_id):
+    return f"video_version_{video_id}"
+
+
+def _category_version_key(category):
+    return f"video_list_version_{hashlib.md5(category.encode()).hexdigest()[:12]}"
+
+
+def _version(key, timeout=None):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=timeout)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key, timeout=None):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), timeout=timeout)
+
+
+def _initial_version():
+    # Starting from the clock (instead of 1) keeps a lost counter from reviving old entries.
+    return time.time_ns() // 1000
@@ -0,0 +1,89 @@
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .api.serializers import VideoSerializer
+from .cache_keys import catalogue_version, category_versions, rows_cache_key, rows_categories_cache_key
+from .models import Video
+
+
+ROWS_MATERIALIZED_KEY = "video_rows_materialized"
+ROWS_CACHE_TIMEOUT = 60 * 60  # 1 hour, safety net: the rows are kept up to date by the signals
+ROWS_PER_CATEGORY = 10
+
+
+def get_rows():
+    """
+    Returns {category: [video, ...]} with the newest ROWS_PER_CATEGORY videos per category.
+    Thumbnail URLs are relative, the view makes them absolute.
+    Every category is its own cache entry under the category generation, the category list is stored under the
+    catalogue generation (see cache_keys.py). The generations are read before the database, so an entry built
+    from an older state is written under a generation that is never read again.
+    """
+
+    list_key = rows_categories_cache_key(catalogue_version())
+    categories = cache.get(list_key)
+    if categories is None:
+        categories = _query_categories()
+        versions = category_versions(categories)
+        rows = build_rows()
+        for category in categories:
+            _store_category(category, versions[category], rows.get(category, []))
+        cache.set(list_key, categories, timeout=ROWS_CACHE_TIMEOUT)
+        cache.set(ROWS_MATERIALIZED_KEY, True, timeout=ROWS_CACHE_TIMEOUT)
+        return rows
+
+    versions = category_versions(categories)
+    keys = {category: rows_cache_key(category, versions[category]) for category in categories}
+    cached = cache.get_many(list(keys.values()))
+
+    rows = {}
+    for category, key in keys.items():
+        videos = cached[key] if key in cached else _store_category(category, versions[category])
+        if videos:
+            rows[category] = videos
+    return rows
+
+
+def build_rows():
+    """
+    Materializes all rows with a single windowed query.
+    """
+
+    newest_first = [F('created_at').desc(), F('id').desc()]
+    ranked = Video.objects.annotate(
+        row_number=Window(RowNumber(), partition_by=[F('category')], order_by=newest_first)
+    ).filter(row_number__lte=ROWS_PER_CATEGORY).order_by('category', 'row_number')
+
+    rows = {}
+    for video in ranked:
+        rows.setdefault(video.category, []).append(dict(VideoSerializer(video).data))
+    return rows
+
+
+def refresh_categories(*categories):
+    """
+    Incremental update after a save or delete, called after invalidate_video(): only the given categories and the
+    category list are queried again. Concurrent updates of different categories touch different cache entries.
+    Nothing is queried while the rows have not been requested (the first get_rows() builds them).
+    """
+
+    if not cache.get(ROWS_MATERIALIZED_KEY):
+        return
+
+    list_key = rows_categories_cache_key(catalogue_version())
+    for category, version in category_versions(set(categories)).items():
+        _store_category(category, version)
+    cache.set(list_key, _query_categories(), timeout=ROWS_CACHE_TIMEOUT)
+
+
+def _query_categories():
+    return sorted(Video.objects.order_by().values_list('category', flat=True).distinct())
+
+
+def _store_category(category, version, videos=None):
+    if videos is None:
+        queryset = Video.objects.filter(category=category).order_by('-created_at', '-id')[:ROWS_PER_CATEGORY]
+        videos = [dict(video) for video in VideoSerializer(queryset, many=True).data]
+    cache.set(rows_cache_key(category, version), videos, timeout=ROWS_CACHE_TIMEOUT)
+    return videos
@@ -0,0 +1,187 @@
+import fcntl, hashlib, json, os, shutil, tempfile, time
+from contextlib import contextmanager
+
+
+MANIFEST_NAME = "manifest.json"
+PARTIAL_SUFFIX = ".partial"
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+
+def partial_dir(output_base, res):
+    """
+    ffmpeg writes a rendition here; it is renamed to output_base/<res> only once it is complete.
+    """
+
+    return os.path.join(output_base, f".{res}{PARTIAL_SUFFIX}")
+
+
+def rendition_dir_name(res, revision=None):
+    """
+    "720p" for the first encode, "720p.<revision>" for a re-encode that is published next to the previous one.
+    """
+
+    return f"{res}.{revision}" if revision else res
+
+
+def rendition_resolution(name):
+    """
+    The resolution of a rendition directory name ("720p" or "720p.<revision>"), None for any other name
+    (e.g. the hidden partial and staging directories).
+    """
+
+    res, separator, revision = name.partition(".")
+    if not res or (separator and not revision.isdigit()):
+        return None
+    return res
+
+
+def rendition_dirs(output_base):
+    """
+    {res: directory name} of the renditions the manifest currently publishes.
+    """
+
+    return {res: entry.get("dir", res) for res, entry in read_manifest(output_base)["renditions"].items()}
+
+
+def read_manifest(output_base):
+    try:
+        with open(os.path.join(output_base, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"renditions": {}}
+
+
+def completed_renditions(output_base):
+    """
+    Renditions recorded in the manifest whose files are all still there with the recorded sizes.
+    A rendition directory without a manifest entry (e.g. a crash right after the rename) counts as missing.
+    """
+
+    completed = set()
+    for res, entry in read_manifest(output_base)["renditions"].items():
+        output_dir = os.path.join(output_base, entry.get("dir", res))
+        if all(_size(os.path.join(output_dir, name)) == info["size"] for name, info in entry["files"].items()):
+            completed.add(res)
+    return completed
+
+
+def commit_rendition(output_base, res, **info):
+    """
+    Moves a finished rendition from its partial directory into place and records it with
+    the checksums of its files in the manifest.
+    """
+
+    source_dir = partial_dir(output_base, res)
+    output_dir = os.path.join(output_base, res)
+    files = checksums(source_dir)
+
+    with manifest_lock(output_base):
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.rename(source_dir, output_dir)
+        record_rendition(output_base, res, files, **info)
+
+
+def record_rendition(output_base, res, files, **info):
+    """
+    Writes the manifest entry of a rendition (callers hold the manifest lock or own the directory).
+    """
+
+    manifest = read_manifest(output_base)
+    manifest["renditions"][res] = {"completed_at": int(time.time()), **info, "files": files}
+    write_atomic(os.path.join(output_base, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def adopt_rendition(output_base, res, staging_base):
+    """
+    Publishes the committed rendition from staging_base (quality re-encode) in a new directory next to the
+    online one and records it as the current rendition. Returns the name of the superseded directory: players
+    that loaded its playlist keep fetching its files, so it is only removed later (prune_renditions).
+    """
+
+    entry = read_manifest(staging_base)["renditions"][res]
+    name = rendition_dir_name(res, time.time_ns() // 1000)
+
+    with manifest_lock(output_base):
+        previous = rendition_dirs(output_base).get(res)
+        os.rename(os.path.join(staging_base, res), os.path.join(output_base, name))
+        record_rendition(output_base, res, entry.pop("files"), **{**entry, "dir": name, "completed_at": int(time.time())})
+    return previous
+
+
+def prune_renditions(output_base, names):
+    """
+    Removes superseded rendition directories, unless the manifest publishes them (again) by now.
+    """
+
+    with manifest_lock(output_base):
+        current = set(rendition_dirs(output_base).values())
+        for name in set(names) - current:
+            if rendition_resolution(name):
+                shutil.rmtree(os.path.join(output_base, name), ignore_errors=True)
+
+
+def checksums(directory):
+    """
+    {file name: {"size", "sha256"}} of all files in a rendition directory.
+    """
+
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        digest = hashlib.sha256()
+        with open(os.path.join(directory, name), "rb") as f:
+            for chunk in iter(lambda: f.read(CHECKSUM_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        files[name] = {"size": os.path.getsize(os.path.join(directory, name)), "sha256": digest.hexdigest()}
+    return files
+
+
+def verify_rendition(output_base, res):
+    """
+    Full integrity check against the recorded checksums (reads every file).
+    """
+
+    entry = read_manifest(output_base)["renditions"].get(res)
+    if entry is None:
+        return False
+
+    output_dir = os.path.join(output_base, entry.get("dir", res))
+    try:
+        return checksums(output_dir) == entry["files"]
+    except FileNotFoundError:
+        return False
+
+
+@contextmanager
+def manifest_lock(output_base):
+    """
+    Serializes the writers of a video directory (manifest, rendition directories, master.m3u8).
+    flock works across the rqworker processes (fan-out) and the threads of pool mode.
+    """
+
+    with open(os.path.join(output_base, ".manifest.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def write_atomic(path, content):
+    """
+    Readers see either the old or the new file, never a partial one (also after a crash).
+    """
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return None
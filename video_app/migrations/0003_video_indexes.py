@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_app', '0002_alter_video_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['-created_at', '-id'], name='video_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='video_category_created_idx'),
+        ),
+    ]
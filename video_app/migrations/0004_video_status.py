@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:42
+
+from django.db import migrations, models
+
+
+def mark_existing_ready(apps, schema_editor):
+    # Videos uploaded before the status field was added have already been converted.
+    apps.get_model('video_app', 'Video').objects.update(status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_app', '0003_video_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='queued', max_length=20),
+        ),
+        migrations.RunPython(mark_existing_ready, migrations.RunPython.noop),
+    ]
@@ -1,17 +1,87 @@
 import os
 
 from django.conf import settings
+from django.core.files.storage import default_storage
 from django.db import models
 
+from .validators import validate_video_file
+
+
+def hls_base_dir(video_id):
+    return os.path.join(settings.MEDIA_ROOT, 'hls', str(video_id))
+
 
 class Video(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        PROCESSING = 'processing', 'Processing'
+        READY = 'ready', 'Ready'
+        FAILED = 'failed', 'Failed'
+
     created_at = models.DateTimeField(auto_now_add=True)
     title = models.CharField(max_length=255)
     description = models.TextField()
     thumbnail = models.ImageField(upload_to='thumbnails/')
+    # {format: {width: name}}, written by the create_thumbnail_variants job
+    thumbnail_variants = models.JSONField(default=dict, blank=True)
     category = models.CharField(max_length=100)
-    video_file = models.FileField(upload_to='videos/')
+    video_file = models.FileField(upload_to='videos/', validators=[validate_video_file])
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+
+    # Source properties, stored by the probe stage of the conversion (see tasks._probe)
+    duration = models.FloatField(null=True, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    fps = models.FloatField(null=True, blank=True)
+    video_codec = models.CharField(max_length=32, blank=True)
+    audio_codec = models.CharField(max_length=32, blank=True)
+    bitrate = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='video_created_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='video_category_created_idx'),
+        ]
+
+    # Values as loaded from the database, so the signals can detect changes without a SELECT.
+    TRACKED_FIELDS = ('category', 'thumbnail', 'video_file')
+    PROBE_FIELDS = ('duration', 'width', 'height', 'fps', 'video_codec', 'audio_codec', 'bitrate')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if all(field in loaded for field in cls.TRACKED_FIELDS):
+            instance._previous_values = {field: loaded[field] for field in cls.TRACKED_FIELDS}
+        return instance
+
+    @property
+    def previous_values(self):
+        """
+        The tracked values of the last load or save, or None if unknown (e.g. deferred fields).
+        """
+
+        return getattr(self, '_previous_values', None)
+
+    def remember_values(self):
+        self._previous_values = {
+            'category': self.category, 'thumbnail': self.thumbnail.name or '', 'video_file': self.video_file.name or '',
+        }
+
+    def reset_probe(self):
+        for field in self.PROBE_FIELDS:
+            setattr(self, field, self._meta.get_field(field).get_default())
+
+    def thumbnail_urls(self):
+        """
+        {format: {width: URL}} of the resized thumbnails (relative URLs, like FieldFile.url).
+        """
+
+        return {
+            file_format: {width: default_storage.url(name) for width, name in names.items()}
+            for file_format, names in self.thumbnail_variants.items()
+        }
 
     @property
     def base_dir(self):
-        return os.path.join(settings.MEDIA_ROOT, 'hls', str(self.id))
+        return hls_base_dir(self.id)
@@ -0,0 +1,80 @@
+import time
+
+from django.core.cache import cache
+
+
+PROGRESS_UPDATE_INTERVAL = 2          # seconds between two cache writes per ffmpeg process
+PROGRESS_CACHE_TIMEOUT = 24 * 60 * 60  # 24 hours
+
+
+def progress_cache_key(video_id, res):
+    return f"video_progress_{video_id}_{res}"
+
+
+def get_progress(video_id, renditions):
+    """
+    Returns {rendition: {"percent", "fps", "eta"}} for the renditions that reported progress.
+    """
+
+    keys = {progress_cache_key(video_id, res): res for res in renditions}
+    return {keys[key]: value for key, value in cache.get_many(list(keys)).items()}
+
+
+class ProgressReporter:
+    """
+    Parses the key=value blocks of `ffmpeg -progress pipe:1` and stores percent, fps and ETA
+    of the renditions encoded by that process, throttled to one cache write every PROGRESS_UPDATE_INTERVAL.
+    """
+
+    def __init__(self, video_id, renditions, duration):
+        self.video_id = video_id
+        self.renditions = list(renditions)
+        self.duration = duration
+        self._block = {}
+        self._last_update = 0
+
+    def feed(self, line):
+        key, _, value = line.strip().partition("=")
+        if not key:
+            return
+
+        self._block[key] = value
+        if key == "progress":
+            self._update(finished=value == "end")
+            self._block = {}
+
+    def _update(self, finished):
+        now = time.monotonic()
+        if not finished and now - self._last_update < PROGRESS_UPDATE_INTERVAL:
+            return
+        self._last_update = now
+
+        progress = self.parse(self._block, self.duration, finished)
+        if progress is None:
+            return
+        cache.set_many({progress_cache_key(self.video_id, res): progress for res in self.renditions}, timeout=PROGRESS_CACHE_TIMEOUT)
+
+    @staticmethod
+    def parse(block, duration, finished=False):
+        """
+        Returns None while ffmpeg reports no position yet (out_time_us=N/A while the encoder buffers).
+        """
+
+        if finished:
+            return {"percent": 100.0, "fps": _number(block.get("fps")), "eta": 0}
+        if not block.get("out_time_us", "").isdigit():
+            return None
+
+        position = int(block["out_time_us"]) / 1_000_000
+        speed = _number(block.get("speed", "").rstrip("x"))
+        percent = min(position / duration * 100, 99.9) if duration else 0.0
+        eta = round((duration - position) / speed) if duration and speed else None
+
+        return {"percent": round(percent, 1), "fps": _number(block.get("fps")), "eta": eta}
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class SegmentCache:
+    """
+    Per-process LRU cache for HLS segments with a byte budget.
+    A segment is only admitted after it was requested ADMIT_AFTER times, so one-off requests
+    (scrubbing, crawlers) do not push popular segments out. It never touches the default cache alias.
+    """
+
+    MAX_TRACKED_KEYS = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._seen = OrderedDict()
+        self.clear()
+
+    @property
+    def max_bytes(self):
+        return settings.HLS_SEGMENT_CACHE["MAX_BYTES"]
+
+    @property
+    def admit_after(self):
+        return settings.HLS_SEGMENT_CACHE["ADMIT_AFTER"]
+
+    def get(self, key, etag):
+        """
+        Returns the cached entry if it is still valid for the given ETag.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["etag"] != etag:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def admit(self, key, size):
+        """
+        Counts a miss towards the admission policy. Returns True if the segment should be cached now.
+        """
+
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            seen = self._seen.pop(key, 0) + 1
+            if seen >= self.admit_after:
+                return True
+
+            self._seen[key] = seen
+            while len(self._seen) > self.MAX_TRACKED_KEYS:
+                self._seen.popitem(last=False)
+            return False
+
+    def set(self, key, data, etag, last_modified):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old["data"])
+
+            self._entries[key] = {"data": data, "etag": etag, "last_modified": last_modified}
+            self.size += len(data)
+
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted["data"])
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._seen.clear()
+            self.size = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / requests, 4) if requests else 0.0,
+            }
+
+
+segment_cache = SegmentCache()
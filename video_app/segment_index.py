@@ -0,0 +1,89 @@
+import json, os, re, time
+from functools import lru_cache
+
+from .manifest import write_atomic
+from .models import hls_base_dir
+from .utils import INIT_SEGMENT_NAME, SINGLE_FILE_NAMES, read_media_playlist
+
+
+SEGMENT_INDEX_NAME = "segments.json"
+SEGMENT_INDEX_CACHE_SIZE = 512  # renditions per process
+
+# Names the transcode job produces; everything else is rejected before the index is even loaded.
+SEGMENT_NAME_PATTERN = re.compile(r"segment_\d{3,}\.(?:ts|m4s)|init\.mp4|media\.(?:ts|m4s)")
+
+
+def write_segment_index(output_dir):
+    """
+    Written by the transcode job next to index.m3u8 before the rendition is committed:
+    {"created": ns, "files": {name: size}, "segments": [[name, size, duration, offset], ...]}, the init segment
+    (fMP4) first. The offsets are the positions in the concatenated rendition, which for single-file renditions
+    are the byte ranges in the media file.
+    """
+
+    index = build_segment_index(output_dir)
+    write_atomic(os.path.join(output_dir, SEGMENT_INDEX_NAME), json.dumps(index, separators=(",", ":")))
+    return index
+
+
+def build_segment_index(output_dir, created=None):
+    playlist = read_media_playlist(os.path.join(output_dir, "index.m3u8"))
+    entries = playlist["segments"]
+    if playlist["map"]:
+        uri, map_range = playlist["map"]
+        entries.insert(0, (uri, 0.0, map_range))
+    elif os.path.exists(os.path.join(output_dir, INIT_SEGMENT_NAME)):
+        entries.insert(0, (INIT_SEGMENT_NAME, 0.0, None))
+
+    files, segments, offset = {}, [], 0
+    for name, duration, byte_range in entries:
+        if name not in files:
+            files[name] = os.path.getsize(os.path.join(output_dir, name))
+        if byte_range:
+            size, offset = byte_range
+        else:
+            size = files[name]
+        segments.append([name, size, duration, offset])
+        offset += size
+    return {"created": created or time.time_ns(), "files": files, "segments": segments}
+
+
+@lru_cache(maxsize=SEGMENT_INDEX_CACHE_SIZE)
+def rendition_index(video_id, resolution, version):
+    """
+    {"created", "files": {name: size}, "segments": [(name, size, duration, offset), ...]} of a published rendition, or None.
+    Loaded once per process and video version; publishing a rendition bumps the version.
+    """
+
+    output_dir = os.path.join(hls_base_dir(video_id), resolution)
+    try:
+        with open(os.path.join(output_dir, SEGMENT_INDEX_NAME)) as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        index = _legacy_index(output_dir)
+        if index is None:
+            return None
+
+    return {"created": index["created"], "files": index["files"], "segments": [tuple(segment) for segment in index["segments"]]}
+
+
+def segment_validators(index, name):
+    """
+    ETag and Last-Modified of a file from the index (committed renditions are never modified in place).
+    """
+
+    size = index["files"][name]
+    return f'"{size:x}-{index["created"]:x}"', index["created"] // 10**9
+
+
+def is_single_file(name):
+    return name in SINGLE_FILE_NAMES.values()
+
+
+def _legacy_index(output_dir):
+    # Renditions committed before the segment index existed: built from the playlist once.
+    playlist_path = os.path.join(output_dir, "index.m3u8")
+    try:
+        return build_segment_index(output_dir, created=os.stat(playlist_path).st_mtime_ns)
+    except FileNotFoundError:
+        return None
@@ -1,23 +1,33 @@
 import os, shutil
 
-from django.core.cache import cache
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 
+from .cache_keys import invalidate_video
+from .catalogue import refresh_categories
 from .models import Video
-from .tasks import convert_video_hls
+from .tasks import convert_video_hls, create_thumbnail_variants
+from .thumbnails import delete_variants
 
 
 @receiver(post_save, sender=Video)
 def video_post_save(sender, instance, created, **kwargs):
     """
-    A video object is stored in the database.
+    A video object is stored in the database. A conversion is only enqueued for new or replaced video files,
+    the thumbnail variants only for new or replaced thumbnails.
     """
         
-    print(f"🎥 New Video: {instance.video_file.path}")
-    convert_video_hls.delay(instance.id)
+    if created or instance.__dict__.pop('_video_file_changed', False):
+        print(f"🎥 New Video: {instance.video_file.path}")
+        convert_video_hls.delay(instance.id)
+
+    thumbnail_changed = created or instance.__dict__.pop('_thumbnail_changed', False)
+    if thumbnail_changed and instance.thumbnail:
+        create_thumbnail_variants.delay(instance.id)
 
     clear_cache(instance)
+    refresh_categories(instance.category, instance.__dict__.pop('_previous_category', instance.category))
+    instance.remember_values()
 
 
 @receiver(post_delete, sender=Video)
@@ -34,54 +44,60 @@ def delete_files(sender, instance, **kwargs):
     
     if hasattr(instance, 'base_dir') and os.path.exists(instance.base_dir):
         shutil.rmtree(instance.base_dir)
+    delete_variants(instance.id)
 
     clear_cache(instance)
+    refresh_categories(instance.category)
 
 
 @receiver(pre_save, sender=Video)
 def delete_old_files_on_update(sender, instance, **kwargs):
     """
     When updating, delete the old file (hls, thumbnails, videos) before saving the new one.
+    The previous values are tracked by the model, the row is only fetched if they are unknown.
     """
     
     if not instance.pk:
         return
 
-    try:
-        old_instance = Video.objects.get(pk=instance.pk)
-    except Video.DoesNotExist:
-        return
+    previous = instance.previous_values
+    if previous is None:
+        try:
+            previous = Video.objects.values(*Video.TRACKED_FIELDS).get(pk=instance.pk)
+        except Video.DoesNotExist:
+            return
     
-    _delete_video_hls_thumbnail(old_instance, instance)
+    _delete_video_hls_thumbnail(previous, instance)
+    if previous['video_file'] != (instance.video_file.name or ''):
+        instance.status = Video.Status.QUEUED
+        instance.reset_probe()
+        instance._video_file_changed = True
+    if previous['thumbnail'] != (instance.thumbnail.name or ''):
+        delete_variants(instance.id)
+        instance.thumbnail_variants = {}
+        instance._thumbnail_changed = True
+    if previous['category'] != instance.category:
+        invalidate_video(instance.id, previous['category'])
+        instance._previous_category = previous['category']
 
 
-def _delete_video_hls_thumbnail(old_instance, instance):
-    if old_instance.video_file and old_instance.video_file != instance.video_file:
-        old_instance.video_file.delete(save=False)
-        clear_cache(old_instance)
+def _delete_video_hls_thumbnail(previous, instance):
+    if previous['video_file'] and previous['video_file'] != (instance.video_file.name or ''):
+        instance.video_file.storage.delete(previous['video_file'])
+        invalidate_video(instance.id, previous['category'])
 
-        if hasattr(old_instance, 'base_dir') and os.path.exists(old_instance.base_dir):
-            shutil.rmtree(old_instance.base_dir)
+        if os.path.exists(instance.base_dir):
+            shutil.rmtree(instance.base_dir)
 
-    if old_instance.thumbnail and old_instance.thumbnail != instance.thumbnail:
-        old_instance.thumbnail.delete(save=False)
+    if previous['thumbnail'] and previous['thumbnail'] != (instance.thumbnail.name or ''):
+        instance.thumbnail.storage.delete(previous['thumbnail'])
 
 
 def clear_cache(instance):
     """
-    Clear cache for VideoView, VideoHLSView and VideoHLSSegmentView.
+    Clear cache for VideoView and VideoHLSView by bumping the cache generation of the video (O(1)).
+    Cached segments are validated against the file ETag by the segment cache.
     """
     
+    invalidate_video(instance.id, instance.category)
     print('✅ Cache cleared.')
-    cache.delete("video_list")
-
-    video_id = instance.id
-    for res in ["480p", "720p", "1080p"]:
-        cache.delete(f"hls_playlist_{video_id}_{res}")
-
-    for res in ["480p", "720p", "1080p"]:
-        dir_path = os.path.join(instance.base_dir, res)
-        if os.path.exists(dir_path):
-            for filename in os.listdir(dir_path):
-                if filename.endswith(".ts"):
-                    cache.delete(f"hls_segment_{video_id}_{res}_{filename}")
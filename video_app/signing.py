@@ -0,0 +1,56 @@
+import base64, re, time
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+
+SEGMENT_TOKEN_PARAM = "token"
+SEGMENT_TOKEN_SALT = "video_app.segment"
+MAP_URI_RE = re.compile(rb'URI="([^"?]+)"')
+
+
+def segment_token(video_id, resolution, expires):
+    """
+    "<expires>.<signature>": HMAC-SHA256 (keyed with SECRET_KEY) over video, rendition and expiry.
+    """
+
+    digest = salted_hmac(SEGMENT_TOKEN_SALT, f"{video_id}:{resolution}:{expires}", algorithm="sha256").digest()
+    return f"{expires}.{base64.urlsafe_b64encode(digest).rstrip(b'=').decode()}"
+
+
+def verify_segment_token(token, video_id, resolution):
+    """
+    One HMAC and a clock check, no database or cache access.
+    """
+
+    expires, _, _ = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return constant_time_compare(token, segment_token(video_id, resolution, int(expires)))
+
+
+def sign_playlist(playlist, video_id, resolution):
+    """
+    Appends a segment token to every URI of a cached media playlist ({"data", "etag", "last_modified"}).
+    The expiry is rounded to HLS_SIGNED_URLS["GRANULARITY"], so the signed playlist and its validators only
+    change once per window and conditional requests keep working.
+    """
+
+    config = settings.HLS_SIGNED_URLS
+    window_start = int(time.time()) // config["GRANULARITY"] * config["GRANULARITY"]
+    expires = window_start + config["GRANULARITY"] + config["TTL"]
+    query = f"?{SEGMENT_TOKEN_PARAM}={segment_token(video_id, resolution, expires)}".encode()
+
+    lines = []
+    for line in playlist["data"].splitlines():
+        if line and not line.startswith(b"#"):
+            line += query
+        elif line.startswith(b"#EXT-X-MAP:"):
+            line = MAP_URI_RE.sub(lambda match: b'URI="' + match.group(1) + query + b'"', line)
+        lines.append(line)
+
+    return {
+        "data": b"\n".join(lines) + b"\n",
+        "etag": f'{playlist["etag"][:-1]}-{expires:x}"',
+        "last_modified": max(playlist["last_modified"], window_start),
+    }
@@ -1,76 +1,517 @@
-import os, subprocess
+import os, shutil, subprocess, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
+import django_rq
+from django.conf import settings
 from django_rq import job
+from rq import Callback, get_current_job
 
-from .models import Video
+from .cache_keys import invalidate_hls, invalidate_video
+from .catalogue import refresh_categories
+from .manifest import (
+    adopt_rendition, commit_rendition, completed_renditions, manifest_lock, partial_dir, prune_renditions, read_manifest, rendition_dirs,
+    write_atomic,
+)
+from .models import Video, hls_base_dir
+from .progress import ProgressReporter
+from .segment_index import write_segment_index
+from .thumbnails import create_variants
+from .utils import INIT_SEGMENT_NAME, SINGLE_FILE_NAMES, InvalidVideoError, build_master_playlist, build_trickplay_vtt, probe_source, renditions_for_source
 
 
-CONTENT = """
-    #EXTM3U
-    #EXT-X-VERSION:3
+RESOLUTIONS = {res: rung["SIZE"] for res, rung in settings.HLS_ENCODING_LADDER.items()}
 
-    #EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=854x480
-    480p/index.m3u8
-    #EXT-X-STREAM-INF:BANDWIDTH=1400000,RESOLUTION=1280x720
-    720p/index.m3u8
-    #EXT-X-STREAM-INF:BANDWIDTH=2800000,RESOLUTION=1920x1080
-    1080p/index.m3u8
-"""
+PROFILE_FAST = "fast"        # quick first availability
+PROFILE_QUALITY = "quality"  # background re-encode
+QUALITY_STAGING_DIR = ".quality"
+DEFAULT_GOP = 48             # frames, if the source frame rate is unknown
+
+SEGMENT_TYPE_MPEGTS = "mpegts"  # .ts segments
+SEGMENT_TYPE_FMP4 = "fmp4"      # CMAF: init.mp4 + .m4s segments
+
+TRICKPLAY_DIR = "trickplay"
+TRICKPLAY_VTT_NAME = "thumbnails.vtt"
+
+TRANSCODE_FANOUT = "fanout"          # one RQ job per rendition, finalize_hls once all succeeded
+TRANSCODE_SPLIT = "split"            # one decode, all renditions in a single ffmpeg pass
+TRANSCODE_POOL = "pool"              # one ffmpeg process per rendition, run concurrently
+TRANSCODE_SEQUENTIAL = "sequential"  # one ffmpeg process per rendition, one after another
 
 
 @job('default')
 def convert_video_hls(video_id):
     """
     Creates HLS streams in 480p, 720p, and 1080p using ffmpeg. Runs in the background via django-rq.
+    Renditions above the source resolution are skipped. The lowest rendition is encoded first and
+    master.m3u8 is (re)written after every finished rendition, so the video is playable after the 480p encode.
+    In fanout mode this job only enqueues one transcode_rendition job per missing rendition and
+    a finalize_hls job that depends on all of them, so the renditions spread over all rqworkers.
+    The per-rendition timings are stored in the RQ job meta under "timings", the encoding
+    progress in the cache (see progress.py) and the outcome in Video.status.
+    The first stage probes the source and stores its properties on the video; files that are
+    not a decodable video are rejected before any encoding starts.
+    """
+
+    _set_status(video_id, Video.Status.PROCESSING)
+    try:
+        video = Video.objects.get(id=video_id)
+        _probe(video)
+        source = _source(video)
+        resolutions = renditions_for_source(RESOLUTIONS, source["height"])
+        if settings.HLS_TRANSCODE_MODE == TRANSCODE_FANOUT:
+            _enqueue_pipeline(source, resolutions)
+            return
+
+        timings = _conversion_process(source, resolutions)
+        _report_timings(timings)
+        _create_master_playlist(source["output_base"])
+        invalidate_hls(video_id)
+    except InvalidVideoError as error:
+        _set_status(video_id, Video.Status.FAILED)
+        print(f"❌ Video {video_id} rejected: {error}")
+        return
+    except Exception:
+        _set_status(video_id, Video.Status.FAILED)
+        raise
+
+    _set_status(video_id, Video.Status.READY)
+    print(f"✅ HLS conversion for video {video_id} completed.")
+
+    if settings.HLS_TRICKPLAY["ENABLED"]:
+        create_trickplay(video_id)
+    _enqueue_quality_reencode(video_id)
+
+
+@job('default')
+def create_thumbnail_variants(video_id):
+    """
+    Resizes the uploaded thumbnail to the responsive variants (WebP with JPEG fallback) in the background.
+    The catalogue caches contain the srcset map, so they are refreshed afterwards.
     """
 
     video = Video.objects.get(id=video_id)
-    input_path = video.video_file.path
-    output_base = video.base_dir
-    os.makedirs(output_base, exist_ok=True)
-    
-    resolutions = {"480p": "854:480", "720p": "1280:720", "1080p": "1920:1080"}
-    _conversion_process(resolutions, output_base, input_path)
+    if not video.thumbnail:
+        return
+
+    try:
+        variants = create_variants(video)
+    except OSError as error:
+        # Unreadable image: the original thumbnail stays the only one.
+        print(f"❌ Thumbnail variants for video {video_id} failed: {error}")
+        return
+    Video.objects.filter(pk=video_id).update(thumbnail_variants=variants)
+
+    invalidate_video(video_id, video.category)
+    refresh_categories(video.category)
+    print(f"✅ Thumbnail variants for video {video_id} created.")
+
+
+def transcode_rendition(video_id, res):
+    """
+    Fan-out stage: converts a single rendition (and publishes it, see _convert_rendition).
+    Enqueued by convert_video_hls with its own timeout.
+    """
+
+    source = _source(Video.objects.get(id=video_id))
+    seconds = _convert_rendition(source, res, RESOLUTIONS[res])
+    _report_timings({res: seconds})
+
+
+def finalize_hls(video_id):
+    """
+    Final stage: RQ only runs it after every transcode_rendition job of the video has succeeded.
+    """
+
+    video = Video.objects.get(id=video_id)
+    _collect_timings(video.base_dir)
     _create_master_playlist(video.base_dir)
+    invalidate_hls(video_id)
 
+    _set_status(video_id, Video.Status.READY)
     print(f"✅ HLS conversion for video {video_id} completed.")
+    _enqueue_quality_reencode(video_id)
+
+
+def create_trickplay(video_id):
+    """
+    Seek previews: sprite sheets with one tile every HLS_TRICKPLAY["INTERVAL"] seconds and a WebVTT
+    track that indexes them, in media/hls/<id>/trickplay/. A failure here does not affect playback.
+    """
+
+    config = settings.HLS_TRICKPLAY
+    video = Video.objects.get(id=video_id)
+    source = _source(video)
+    width, height = config["WIDTH"], _tile_height(config["WIDTH"], video)
+
+    output_dir = _prepare_partial_dir(source, TRICKPLAY_DIR)
+    print(f"🔧 Create trickplay sprites for video {video_id} …")
+    try:
+        subprocess.run(_trickplay_command(source, output_dir, width, height), check=True)
+    except (OSError, subprocess.CalledProcessError) as error:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        print(f"❌ Trickplay for video {video_id} failed: {error}")
+        return
+
+    vtt = build_trickplay_vtt(video.duration, config["INTERVAL"], width, height, config["COLUMNS"], config["ROWS"])
+    with open(os.path.join(output_dir, TRICKPLAY_VTT_NAME), "w") as f:
+        f.write(vtt)
+
+    trickplay_dir = os.path.join(source["output_base"], TRICKPLAY_DIR)
+    shutil.rmtree(trickplay_dir, ignore_errors=True)
+    os.rename(output_dir, trickplay_dir)
+    print(f"✅ Trickplay for video {video_id} created.")
+
+
+def reencode_hls(video_id):
+    """
+    Background re-encode of the online renditions with the quality profile. The renditions are encoded into a
+    staging directory, each one is published in a new directory (720p.<revision>) and master.m3u8 is rewritten
+    to point at it. The files of the old encode are never replaced in place: players that loaded its playlists
+    keep fetching them until prune_hls removes them after HLS_SUPERSEDED_RENDITION_TTL.
+    """
+
+    video = Video.objects.get(id=video_id)
+    staging = os.path.join(video.base_dir, QUALITY_STAGING_DIR)
+    shutil.rmtree(staging, ignore_errors=True)
+
+    completed = completed_renditions(video.base_dir)
+    resolutions = {res: size for res, size in RESOLUTIONS.items() if res in completed}
+    source = _source(video, PROFILE_QUALITY, staging, publish=False)
+    _report_timings(_conversion_process(source, resolutions))
+
+    superseded = []
+    for res in resolutions:
+        superseded.append(adopt_rendition(video.base_dir, res, staging))
+        _create_master_playlist(video.base_dir)
+        invalidate_hls(video_id)
+    shutil.rmtree(staging)
+
+    _enqueue_prune(video_id, [name for name in superseded if name])
+    print(f"✅ Quality re-encode for video {video_id} completed.")
+
+
+def prune_hls(video_id, names):
+    """
+    Removes rendition directories superseded by a re-encode (enqueued by reencode_hls with a delay).
+    """
+
+    base_dir = hls_base_dir(video_id)
+    if os.path.isdir(base_dir):
+        prune_renditions(base_dir, names)
+
+
+def _enqueue_quality_reencode(video_id):
+    if not settings.HLS_QUALITY_REENCODE or settings.HLS_ENCODING_PROFILE == PROFILE_QUALITY:
+        return
+
+    # A slow preset needs far more time than the default job timeout allows.
+    django_rq.get_queue('default').enqueue(reencode_hls, video_id, job_timeout=settings.HLS_RENDITION_TIMEOUT * len(RESOLUTIONS) * 4)
+    print(f"📨 Enqueued quality re-encode for video {video_id}.")
+
+
+def _enqueue_prune(video_id, names):
+    if not names:
+        return
+
+    # Scheduled jobs need an rqworker started with --with-scheduler (see backend.entrypoint.sh).
+    delay = timedelta(seconds=settings.HLS_SUPERSEDED_RENDITION_TTL)
+    django_rq.get_queue('default').enqueue_in(delay, prune_hls, video_id, names)
+
+
+def _rendition_failed(job, connection, type, value, traceback):
+    _set_status(job.args[0], Video.Status.FAILED)
+
+
+def _set_status(video_id, status):
+    # update() instead of save(): no signals, so no new conversion is enqueued
+    Video.objects.filter(pk=video_id).update(status=status)
+
+
+def _probe(video):
+    """
+    Probe stage: stores duration, resolution, fps, codecs and bitrate of the source on the video.
+    """
+
+    info = probe_source(video.video_file.path)
+    for field, value in info.items():
+        setattr(video, field, value)
+    Video.objects.filter(pk=video.id).update(**info)
+
+
+def _source(video, profile=None, output_base=None, publish=True):
+    """
+    Everything the ffmpeg helpers need. The source properties come from the probe stage,
+    so the rendition jobs do not run ffprobe again.
+    """
+
+    if video.duration is None:
+        _probe(video)
 
+    output_base = output_base or video.base_dir
+    os.makedirs(output_base, exist_ok=True)
+
+    return {
+        "video_id": video.id,
+        "input_path": video.video_file.path,
+        "output_base": output_base,
+        "profile": profile or settings.HLS_ENCODING_PROFILE,
+        "publish": publish,
+        "duration": video.duration,
+        "height": video.height,
+        "fps": video.fps,
+    }
+
+
+def _enqueue_pipeline(source, resolutions):
+    queue = django_rq.get_queue('default')
+    video_id = source["video_id"]
+
+    rendition_jobs = [
+        queue.enqueue(
+            transcode_rendition, video_id, res,
+            job_timeout=settings.HLS_RENDITION_TIMEOUT, on_failure=Callback(_rendition_failed),
+        )
+        for res in _pending_renditions(resolutions, source["output_base"])
+    ]
+    queue.enqueue(finalize_hls, video_id, depends_on=rendition_jobs or None)
+    if settings.HLS_TRICKPLAY["ENABLED"]:
+        queue.enqueue(create_trickplay, video_id)
 
-def _conversion_process(resolutions, output_base, input_path):
-    for res, size in resolutions.items():
-        output_dir = os.path.join(output_base, res)
-        os.makedirs(output_dir, exist_ok=True)
+    print(f"📨 Enqueued {len(rendition_jobs)} rendition job(s) for video {video_id}.")
 
-        index_path = os.path.join(output_dir, "index.m3u8")
-        if os.path.exists(index_path):
+
+def _pending_renditions(resolutions, output_base):
+    """
+    The renditions that are not recorded as complete in the manifest, lowest first.
+    A re-queued job after a worker crash therefore only encodes the missing renditions.
+    """
+
+    completed = completed_renditions(output_base)
+    pending = {}
+    for res, size in sorted(resolutions.items(), key=lambda item: int(item[1].split(":")[1])):
+        if res in completed:
             print(f"✅ {res} already exists, skip …")
             continue
+        pending[res] = size
+    return pending
+
+
+def _conversion_process(source, resolutions):
+    pending = _pending_renditions(resolutions, source["output_base"])
+    if not pending:
+        return {}
+
+    mode = settings.HLS_TRANSCODE_MODE
+    if mode == TRANSCODE_SPLIT and len(pending) > 2:
+        # The lowest rendition on its own first (playable early), the others from one shared decode.
+        lowest, *higher = pending
+        return {lowest: _convert_rendition(source, lowest, pending[lowest]), **_convert_single_pass(source, {res: pending[res] for res in higher})}
+    if mode == TRANSCODE_SPLIT and len(pending) > 1:
+        return _convert_single_pass(source, pending)
+    if mode == TRANSCODE_POOL and len(pending) > 1:
+        return _convert_in_pool(source, pending)
+    return {res: _convert_rendition(source, res, size) for res, size in pending.items()}
+
+
+def _convert_rendition(source, res, size, threads=None):
+    output_dir = _prepare_partial_dir(source, res)
+    index_path = os.path.join(output_dir, "index.m3u8")
+
+    print(f"🔧 Convert {res} …")
+    started = time.monotonic()
+    _run_ffmpeg(_ffmpeg_command(source, res, size, output_dir, index_path, threads), source, [res])
+    seconds = round(time.monotonic() - started, 2)
+
+    write_segment_index(output_dir)
+    commit_rendition(source["output_base"], res, profile=source["profile"], seconds=seconds)
+    _publish_master(source)
+    return seconds
+
+
+def _convert_in_pool(source, pending):
+    """
+    Runs one ffmpeg process per rendition in parallel. The threads only supervise the ffmpeg
+    processes; the CPUs are shared between them so they do not oversubscribe the machine.
+    """
+
+    workers = min(settings.HLS_TRANSCODE_WORKERS, len(pending))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {res: pool.submit(_convert_rendition, source, res, size, threads) for res, size in pending.items()}
+        return {res: future.result() for res, future in futures.items()}
+
+
+def _convert_single_pass(source, pending):
+    """
+    Decodes the source once and encodes all pending renditions from a split filter graph.
+    """
+
+    print(f"🔧 Convert {', '.join(pending)} in a single pass …")
+    for res in pending:
+        _prepare_partial_dir(source, res)
+
+    started = time.monotonic()
+    _run_ffmpeg(_split_ffmpeg_command(source, pending), source, list(pending))
+
+    elapsed = round(time.monotonic() - started, 2)
+    for res in pending:
+        write_segment_index(partial_dir(source["output_base"], res))
+        commit_rendition(source["output_base"], res, profile=source["profile"], seconds=elapsed)
+    _publish_master(source)
+    return {res: elapsed for res in pending}
+
+
+def _prepare_partial_dir(source, res):
+    # Leftovers of an interrupted encode are discarded, ffmpeg starts from scratch.
+    output_dir = partial_dir(source["output_base"], res)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.makedirs(output_dir)
+    return output_dir
+
+
+def _run_ffmpeg(command, source, renditions):
+    """
+    Runs ffmpeg and feeds its -progress blocks (stdout) to a ProgressReporter; stderr stays in the worker log.
+    """
+
+    reporter = ProgressReporter(source["video_id"], renditions, source["duration"])
+    with subprocess.Popen(command, stdout=subprocess.PIPE, text=True) as process:
+        for line in process.stdout:
+            reporter.feed(line)
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
 
-        print(f"🔧 Convert {res} …")
-        subprocess.run(_ffmpeg_command(input_path, size, output_dir, index_path), check=True)
+def _ffmpeg_command(source, res, size, output_dir, index_path, threads=None):
+    thread_args = ["-threads", str(threads)] if threads else []
+    return [
+            "ffmpeg", "-y", "-progress", "pipe:1", "-nostats", "-i", source["input_path"],
+            "-vf", f"scale={size}", *thread_args,
+            *_encoding_args(source, res, output_dir, index_path),
+        ]
+
+
+def _split_ffmpeg_command(source, pending):
+    labels = [f"v{i}" for i in range(len(pending))]
+    graph = f"[0:v]split={len(pending)}" + "".join(f"[{label}]" for label in labels)
+    for label, size in zip(labels, pending.values()):
+        graph += f";[{label}]scale={size}[{label}out]"
+
+    command = ["ffmpeg", "-y", "-progress", "pipe:1", "-nostats", "-i", source["input_path"], "-filter_complex", graph]
+    for label, res in zip(labels, pending):
+        output_dir = partial_dir(source["output_base"], res)
+        command += ["-map", f"[{label}out]", "-map", "0:a:0?", *_encoding_args(source, res, output_dir, os.path.join(output_dir, "index.m3u8"))]
+    return command
 
 
-def _ffmpeg_command(input_path, size, output_dir, index_path):
+def _encoding_args(source, res, output_dir, index_path):
+    """
+    Rendition settings from HLS_ENCODING_LADDER, preset and CRF from the encoding profile.
+    The CRF is capped by maxrate/bufsize, the GOP follows the source frame rate.
+    """
+
+    rung = settings.HLS_ENCODING_LADDER[res]
+    profile = settings.HLS_ENCODING_PROFILES[source["profile"]]
+    gop = str(_gop_size(source.get("fps")))
     return [
-            "ffmpeg", "-y", "-i", input_path,
-            "-vf", f"scale={size}", "-c:a", "aac",
+            "-c:a", "aac", "-b:a", rung["AUDIO_BITRATE"],
             "-ar", "48000", "-c:v", "h264",
-            "-profile:v", "main", "-crf", "20",
-            "-sc_threshold", "0", "-g", "48",
-            "-keyint_min", "48", "-hls_time", "4",
-            "-hls_playlist_type", "vod", "-hls_segment_filename", os.path.join(output_dir, "segment_%03d.ts"),
+            "-preset", profile["PRESET"], "-profile:v", profile["PROFILE"],
+            "-crf", str(profile["CRF"]), "-maxrate", rung["MAXRATE"], "-bufsize", rung["BUFSIZE"],
+            "-sc_threshold", "0", "-g", gop,
+            "-keyint_min", gop, "-hls_time", "4",
+            "-hls_playlist_type", "vod", *_segment_args(output_dir),
             index_path,
         ]
 
 
-def _create_master_playlist(output_base):
-    master_path = os.path.join(output_base, "master.m3u8")
-    if os.path.exists(master_path):
-        print("✅ master.m3u8 already exists, skip …")
+def _segment_args(output_dir):
+    """
+    With HLS_SINGLE_FILE every rendition is one media file and the playlist addresses the segments with
+    EXT-X-BYTERANGE (for fMP4 the init segment is the first range of that file).
+    """
+
+    fmp4 = settings.HLS_SEGMENT_TYPE == SEGMENT_TYPE_FMP4
+    if settings.HLS_SINGLE_FILE:
+        name = SINGLE_FILE_NAMES[SEGMENT_TYPE_FMP4 if fmp4 else SEGMENT_TYPE_MPEGTS]
+        args = ["-hls_flags", "single_file", "-hls_segment_filename", os.path.join(output_dir, name)]
+    else:
+        args = ["-hls_segment_filename", os.path.join(output_dir, "segment_%03d.m4s" if fmp4 else "segment_%03d.ts")]
+
+    if fmp4:
+        return ["-hls_segment_type", "fmp4", "-hls_fmp4_init_filename", INIT_SEGMENT_NAME, *args]
+    return args
+
+
+def _trickplay_command(source, output_dir, width, height):
+    """
+    The sprite sheets are padded with copies of the last tile: the tile filter drops an incomplete last sheet.
+    """
+
+    config = settings.HLS_TRICKPLAY
+    per_sheet = config["COLUMNS"] * config["ROWS"]
+    video_filter = (
+        f"fps=1/{config['INTERVAL']},scale={width}:{height},"
+        f"tpad=stop_mode=clone:stop={per_sheet - 1},tile={config['COLUMNS']}x{config['ROWS']}"
+    )
+    return [
+        "ffmpeg", "-y", "-i", source["input_path"], "-vf", video_filter, "-an",
+        "-q:v", "5", "-start_number", "0", os.path.join(output_dir, "sprite_%03d.jpg"),
+    ]
+
+
+def _tile_height(width, video):
+    if not video.width or not video.height:
+        return round(width * 9 / 16 / 2) * 2
+    return max(2, round(width * video.height / video.width / 2) * 2)
+
+
+def _gop_size(fps):
+    if not fps:
+        return DEFAULT_GOP
+    return max(1, round(fps * settings.HLS_GOP_SECONDS))
+
+
+def _report_timings(timings):
+    for res, seconds in timings.items():
+        print(f"⏱️ {res}: {seconds}s")
+
+    current_job = get_current_job()
+    if current_job is not None:
+        current_job.meta["timings"] = timings
+        current_job.save_meta()
+
+
+def _collect_timings(output_base):
+    # From the manifest, not from the rendition jobs: their results (and meta) expire after RQ's result_ttl.
+    renditions = read_manifest(output_base)["renditions"]
+    _report_timings({res: renditions[res]["seconds"] for res in RESOLUTIONS if "seconds" in renditions.get(res, {})})
+
+
+def _publish_master(source):
+    """
+    Makes the renditions finished so far playable: rewrites master.m3u8 and drops the cached playlists.
+    """
+
+    if not source["publish"]:
         return
-    
-    content = CONTENT
-    with open(master_path, "w") as f:
-        f.write(content)
+
+    _create_master_playlist(source["output_base"])
+    invalidate_hls(source["video_id"])
+
+
+def _create_master_playlist(output_base):
+    # Scan and write under the manifest lock: renditions published concurrently (pool, fanout) must not
+    # overwrite a master that already lists a rendition committed after their scan.
+    with manifest_lock(output_base):
+        content = build_master_playlist(output_base, RESOLUTIONS, rendition_dirs(output_base))
+        if content is None:
+            print("❌ No finished rendition, master.m3u8 not created.")
+            return
+
+        write_atomic(os.path.join(output_base, "master.m3u8"), content)
 
     print("✅ master.m3u8 created.")
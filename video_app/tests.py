@@ -1,21 +1,94 @@
-import os, shutil, tempfile
+import fcntl, io, os, shutil, subprocess, tempfile, time
 from unittest.mock import patch
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.http import StreamingHttpResponse, FileResponse
 from django.urls import reverse
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase
+from PIL import Image
 from rest_framework import status
 from rest_framework.test import APITestCase, override_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from video_app.api.async_views import AsyncVideoHLSSegmentView, AsyncVideoHLSView
 from video_app.api.serializers import VideoSerializer
+from video_app.cache_keys import (
+    CATEGORY_VERSION_TIMEOUT, category_versions, hls_playlist_cache_key, invalidate_hls, invalidate_video, rows_cache_key,
+    video_list_cache_key, video_meta, video_version,
+)
+from video_app.catalogue import build_rows, get_rows, refresh_categories
+from video_app.manifest import commit_rendition, completed_renditions, partial_dir, read_manifest, rendition_resolution, verify_rendition
 from video_app.models import Video
+from video_app.progress import ProgressReporter, get_progress
+from video_app.segment_cache import SegmentCache, segment_cache
+from video_app.segment_index import build_segment_index, write_segment_index
+from video_app.signing import segment_token
+from video_app.thumbnails import create_variants, variants_dir_name
+from video_app.tasks import (
+    _conversion_process, _report_timings, _rendition_failed, convert_video_hls, create_thumbnail_variants, create_trickplay, finalize_hls,
+    prune_hls, reencode_hls, transcode_rendition,
+)
+from video_app.utils import InvalidVideoError, ProbeUnavailableError, build_master_playlist, build_trickplay_vtt, codecs_string, probe_source, renditions_for_source
 
 User = get_user_model()
 
+FFPROBE_720P = {"streams": [
+    {"codec_type": "video", "codec_name": "h264", "profile": "Main", "level": 31, "width": 1280, "height": 720},
+    {"codec_type": "audio", "codec_name": "aac", "profile": "LC"},
+]}
+SOURCE_1080P = {"duration": 10.0, "width": 1920, "height": 1080, "fps": 25.0, "video_codec": "h264", "audio_codec": "aac", "bitrate": 5000000}
+
+
+def write_rendition(output_dir, segments):
+    """
+    Writes a fake HLS rendition: segments is a list of (duration, size_in_bytes).
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:4"]
+    for i, (duration, size) in enumerate(segments):
+        name = f"segment_{i:03d}.ts"
+        with open(os.path.join(output_dir, name), "wb") as f:
+            f.write(b"x" * size)
+        lines += [f"#EXTINF:{duration},", name]
+    with open(os.path.join(output_dir, "index.m3u8"), "w") as f:
+        f.write("\n".join(lines + ["#EXT-X-ENDLIST"]) + "\n")
+
+
+def write_single_file_rendition(output_dir, segments, init_size=0):
+    """
+    Writes a fake HLS_SINGLE_FILE rendition: one media file addressed by EXT-X-BYTERANGE
+    (fMP4 with an init range of init_size bytes, MPEG-TS without).
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    name = "media.m4s" if init_size else "media.ts"
+    lines = ["#EXTM3U", "#EXT-X-VERSION:4", "#EXT-X-TARGETDURATION:4"]
+    if init_size:
+        lines.append(f'#EXT-X-MAP:URI="{name}",BYTERANGE="{init_size}@0"')
+    offset = init_size
+    for duration, size in segments:
+        lines += [f"#EXTINF:{duration},", f"#EXT-X-BYTERANGE:{size}@{offset}", name]
+        offset += size
+    with open(os.path.join(output_dir, name), "wb") as f:
+        f.write(bytes(i % 251 for i in range(offset)))
+    with open(os.path.join(output_dir, "index.m3u8"), "w") as f:
+        f.write("\n".join(lines + ["#EXT-X-ENDLIST"]) + "\n")
+
+
+def commit_fake_rendition(output_base, res, segments):
+    """
+    A finished rendition as the transcode jobs leave it: renamed into place and recorded in the manifest.
+    """
+
+    write_rendition(partial_dir(output_base, res), segments)
+    write_segment_index(partial_dir(output_base, res))
+    commit_rendition(output_base, res, profile="fast")
+
 
 @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class VideoViewTests(APITestCase):
@@ -39,8 +112,8 @@ class VideoViewTests(APITestCase):
         cls.refresh_token = str(refresh)
 
         dummy_file = SimpleUploadedFile("test_video.mp4", b"file_content", content_type="video/mp4")
-        cls.video1 = Video.objects.create(title="Video A",video_file=dummy_file)
-        cls.video2 = Video.objects.create(title="Video B", video_file=dummy_file)
+        cls.video1 = Video.objects.create(title="Video A", category="Drama", video_file=dummy_file)
+        cls.video2 = Video.objects.create(title="Video B", category="Action", video_file=dummy_file)
 
     def setUp(self):
         cache.clear()
@@ -66,11 +139,12 @@ class VideoViewTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        videos = Video.objects.all().order_by("-created_at")
-        serializer = VideoSerializer(videos, many=True)
+        videos = Video.objects.all().order_by("-created_at", "-id")
+        serializer = VideoSerializer(videos, many=True, context={"request": response.wsgi_request})
 
-        self.assertEqual(response.data, serializer.data)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data["results"], serializer.data)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNone(response.data["next"])
     
     @patch("video_app.signals.convert_video_hls.delay", lambda x: None)
     def test_cache_is_cleared_after_new_video_created(self):
@@ -80,12 +154,14 @@ class VideoViewTests(APITestCase):
         response_1 = self.client.get(self.url)
         
         self.assertEqual(response_1.status_code, status.HTTP_200_OK)
-        self.assertIsNotNone(cache.get("video_list"))
+        cache_key = video_list_cache_key()
+        self.assertIsNotNone(cache.get(cache_key))
     
         dummy_file = SimpleUploadedFile("video_c.mp4", b"file_content", content_type="video/mp4")
         Video.objects.create(title="Video C", video_file=dummy_file)
     
-        self.assertIsNone(cache.get("video_list"))
+        self.assertNotEqual(video_list_cache_key(), cache_key)
+        self.assertIsNone(cache.get(video_list_cache_key()))
 
     def test_video_list_ordering_desc(self):
         """Videos are sorted by -created_at"""
@@ -93,10 +169,191 @@ class VideoViewTests(APITestCase):
         self.authenticate_with_cookies()
         response = self.client.get(self.url)
         
-        titles = [v["title"] for v in response.data]
+        titles = [v["title"] for v in response.data["results"]]
         self.assertEqual(titles[0], "Video B")
         self.assertEqual(titles[1], "Video A")
 
+    def test_video_list_cursor_pagination(self):
+        """page_size=1 → one video per page, the next cursor leads to the older video"""
+
+        self.authenticate_with_cookies()
+        response_1 = self.client.get(self.url, {"page_size": 1})
+
+        self.assertEqual([v["title"] for v in response_1.data["results"]], ["Video B"])
+        self.assertIsNotNone(response_1.data["next"])
+
+        response_2 = self.client.get(response_1.data["next"])
+
+        self.assertEqual([v["title"] for v in response_2.data["results"]], ["Video A"])
+        self.assertIsNone(response_2.data["next"])
+
+    def test_video_list_filter_by_category(self):
+        """?category=Drama → only videos of that category"""
+
+        self.authenticate_with_cookies()
+        response = self.client.get(self.url, {"category": "Drama"})
+
+        self.assertEqual([v["title"] for v in response.data["results"]], ["Video A"])
+
+    @patch("video_app.signals.convert_video_hls.delay", lambda x: None)
+    def test_upload_only_invalidates_its_category(self):
+        """A new Action video keeps the cached Drama pages"""
+
+        self.authenticate_with_cookies()
+        self.client.get(self.url, {"category": "Drama"})
+        self.client.get(self.url, {"category": "Action"})
+        drama_key, action_key = video_list_cache_key("Drama"), video_list_cache_key("Action")
+
+        dummy_file = SimpleUploadedFile("video_c.mp4", b"file_content", content_type="video/mp4")
+        Video.objects.create(title="Video C", category="Action", video_file=dummy_file)
+
+        self.assertEqual(video_list_cache_key("Drama"), drama_key)
+        self.assertIsNotNone(cache.get(drama_key))
+        self.assertNotEqual(video_list_cache_key("Action"), action_key)
+
+    def test_category_generations_expire(self):
+        """?category= is client input: its generation key must not live forever"""
+
+        key = video_list_cache_key("no-such-category")
+
+        with patch("django.core.cache.backends.locmem.time.time", return_value=time.time() + CATEGORY_VERSION_TIMEOUT + 1):
+            self.assertNotEqual(video_list_cache_key("no-such-category"), key)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+@patch("video_app.signals.convert_video_hls.delay", lambda x: None)
+@patch("video_app.signals.create_thumbnail_variants.delay", lambda x: None)
+@patch("video_app.catalogue.ROWS_PER_CATEGORY", 2)
+class VideoRowsViewTests(APITestCase):
+    """
+    Test suite for /api/video/rows/ (catalogue grouped by category).
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    @patch("video_app.signals.convert_video_hls.delay", lambda x: None)
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="rows@example.com", password="Pass123!", email="rows@example.com")
+        cls.url = reverse("video_rows")
+        cls.access_token = str(RefreshToken.for_user(cls.user).access_token)
+
+        for title, category in [("Drama 1", "Drama"), ("Action 1", "Action"), ("Drama 2", "Drama"), ("Drama 3", "Drama")]:
+            dummy_file = SimpleUploadedFile("test_video.mp4", b"file_content", content_type="video/mp4")
+            Video.objects.create(title=title, category=category, video_file=dummy_file)
+
+    def setUp(self):
+        cache.clear()
+        self.client.cookies["access_token"] = self.access_token
+
+    def titles(self, response):
+        return {row["category"]: [video["title"] for video in row["videos"]] for row in response.data}
+
+    def test_returns_newest_videos_per_category(self):
+        """GET /api/video/rows/ → categories with their newest N videos"""
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.titles(response), {"Action": ["Action 1"], "Drama": ["Drama 3", "Drama 2"]})
+
+    def test_rows_are_built_with_a_single_query(self):
+        """All rows come from one windowed query"""
+
+        with self.assertNumQueries(1):
+            build_rows()
+
+    def test_rows_are_updated_incrementally_on_save_and_delete(self):
+        """Saving or deleting a video updates the cached rows without a full rebuild"""
+
+        self.client.get(self.url)
+        dummy_file = SimpleUploadedFile("test_video.mp4", b"file_content", content_type="video/mp4")
+        video = Video.objects.create(title="Action 2", category="Action", video_file=dummy_file)
+
+        self.assertEqual(self.titles(self.client.get(self.url))["Action"], ["Action 2", "Action 1"])
+
+        video.delete()
+
+        self.assertEqual(self.titles(self.client.get(self.url))["Action"], ["Action 1"])
+
+    def test_late_write_of_an_older_state_is_not_read(self):
+        """An update that queried before a newer save writes under an old generation and is ignored"""
+
+        self.client.get(self.url)
+        stale_version = category_versions(["Action"])["Action"]
+        stale_rows = build_rows()["Action"]
+        dummy_file = SimpleUploadedFile("test_video.mp4", b"file_content", content_type="video/mp4")
+        with patch("video_app.signals.refresh_categories"):
+            Video.objects.create(title="Action 2", category="Action", video_file=dummy_file)
+
+        cache.set(rows_cache_key("Action", stale_version), stale_rows)
+
+        self.assertEqual(self.titles(self.client.get(self.url))["Action"], ["Action 2", "Action 1"])
+
+    def test_updates_of_different_categories_use_separate_entries(self):
+        """Refreshing one category never rewrites the cached row of another"""
+
+        self.client.get(self.url)
+        drama_key = rows_cache_key("Drama", category_versions(["Drama"])["Drama"])
+        drama = cache.get(drama_key)
+
+        dummy_file = SimpleUploadedFile("test_video.mp4", b"file_content", content_type="video/mp4")
+        with patch("video_app.catalogue.cache.set", wraps=cache.set) as cache_set:
+            Video.objects.create(title="Action 2", category="Action", video_file=dummy_file)
+
+        self.assertNotIn(drama_key, [call.args[0] for call in cache_set.call_args_list])
+        self.assertEqual(cache.get(drama_key), drama)
+
+    def test_rows_read_from_the_cache_need_no_query(self):
+        """Once materialized, the rows are answered from the cache"""
+
+        self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            get_rows()
+
+    def test_category_change_moves_video_between_rows(self):
+        """Changing the category removes the video from the old row"""
+
+        self.client.get(self.url)
+        video = Video.objects.get(title="Action 1")
+        video.category = "Comedy"
+        video.save()
+
+        rows = get_rows()
+        self.assertNotIn("Action", rows)
+        self.assertEqual([v["title"] for v in rows["Comedy"]], ["Action 1"])
+
+    def test_thumbnail_urls_are_absolute(self):
+        """Materialized rows store relative URLs, the response contains absolute ones"""
+
+        video = Video.objects.get(title="Action 1")
+        video.thumbnail = SimpleUploadedFile("thumb.jpg", b"jpg", content_type="image/jpeg")
+        video.save()
+
+        response = self.client.get(self.url)
+
+        self.assertTrue(response.data[0]["videos"][0]["thumbnail_url"].startswith("http://testserver/media/thumbnails/"))
+
+    def test_thumbnail_srcset_urls_are_absolute(self):
+        """The srcset map of the variants is delivered with absolute URLs as well"""
+
+        video = Video.objects.get(title="Action 1")
+        video.thumbnail = SimpleUploadedFile("thumb.jpg", b"jpg", content_type="image/jpeg")
+        video.save()
+        Video.objects.filter(pk=video.pk).update(thumbnail_variants={"webp": {"320": "thumbnails/variants/1/320-abc.webp"}})
+        refresh_categories("Action")
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(
+            response.data[0]["videos"][0]["thumbnail_srcset"],
+            {"webp": {"320": "http://testserver/media/thumbnails/variants/1/320-abc.webp"}},
+        )
+
 
 @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class VideoHLSViewTests(APITestCase):
@@ -159,6 +416,29 @@ class VideoHLSViewTests(APITestCase):
         self.assertIsInstance(response, StreamingHttpResponse)
         self.assertIn("#EXTM3U", response.getvalue().decode())
 
+    def test_segment_uris_are_signed(self):
+        """Every segment URI carries a token for this video and rendition; the ETag is stable within the window"""
+
+        self.authenticate_with_cookies()
+        response_1 = self.client.get(self.url)
+        response_2 = self.client.get(self.url)
+
+        uri = next(line for line in response_1.getvalue().decode().splitlines() if not line.startswith("#"))
+        name, _, token = uri.partition("?token=")
+        self.assertEqual(name, "fileSequence0.ts")
+        self.assertEqual(token, segment_token(self.video.id, self.resolution, int(token.split(".")[0])))
+        self.assertEqual(response_1["ETag"], response_2["ETag"])
+
+    @override_settings(HLS_SIGNED_URLS={"ENABLED": False, "TTL": 60, "GRANULARITY": 60})
+    def test_segment_uris_are_plain_without_signing(self):
+        """HLS_SIGNED_URLS disabled → the playlist is delivered as written by ffmpeg"""
+
+        self.authenticate_with_cookies()
+        response = self.client.get(self.url)
+
+        with open(self.index_path, "rb") as f:
+            self.assertEqual(response.getvalue(), f.read())
+
     def test_returns_404_if_playlist_not_found(self):
         """If playlist file is missing → 404"""
 
@@ -169,6 +449,36 @@ class VideoHLSViewTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_unknown_resolution_returns_404(self):
+        """Hidden work directories (e.g. an encode in progress) are not served as playlists"""
+
+        self.authenticate_with_cookies()
+        partial_index = os.path.join(partial_dir(self.base_dir, "480p"), "index.m3u8")
+        os.makedirs(os.path.dirname(partial_index))
+        self.addCleanup(shutil.rmtree, os.path.dirname(partial_index))
+        with open(partial_index, "w") as f:
+            f.write("#EXTM3U\n")
+
+        response = self.client.get(reverse("video_hls", args=[self.video.id, ".480p.partial"]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIsNone(cache.get(hls_playlist_cache_key(self.video.id, ".480p.partial")))
+
+    def test_serves_revisioned_rendition_directories(self):
+        """A re-encode is published as <res>.<revision>, the playlist of the previous directory stays available"""
+
+        self.authenticate_with_cookies()
+        output_dir = os.path.join(self.base_dir, "720p.1760000000000000")
+        write_rendition(output_dir, [(4.0, 10)])
+        self.addCleanup(shutil.rmtree, output_dir)
+
+        response = self.client.get(reverse("video_hls", args=[self.video.id, "720p.1760000000000000"]))
+        previous = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("segment_000.ts", response.getvalue().decode())
+        self.assertEqual(previous.status_code, status.HTTP_200_OK)
+
     def test_uses_cache_after_first_request(self):
         """Second GET uses cache"""
 
@@ -176,7 +486,7 @@ class VideoHLSViewTests(APITestCase):
         response_1 = self.client.get(self.url)
 
         self.assertEqual(response_1.status_code, status.HTTP_200_OK)
-        self.assertIsNotNone(cache.get(f"hls_playlist_{self.video.id}_{self.resolution}"))
+        self.assertIsNotNone(cache.get(hls_playlist_cache_key(self.video.id, self.resolution)))
 
         response_2 = self.client.get(self.url)
 
@@ -189,7 +499,7 @@ class VideoHLSViewTests(APITestCase):
         self.authenticate_with_cookies()
         self.client.get(self.url)
         
-        self.assertIsNotNone(cache.get(f"hls_playlist_{self.video.id}_{self.resolution}"))
+        self.assertIsNotNone(cache.get(hls_playlist_cache_key(self.video.id, self.resolution)))
 
         cache.clear()
         with open(self.index_path, "a") as f:
@@ -199,6 +509,64 @@ class VideoHLSViewTests(APITestCase):
 
         self.assertIn("fileSequence1.ts", data)
 
+    def test_invalidation_switches_to_new_cache_key(self):
+        """Invalidating the video moves the playlist to a new cache generation"""
+
+        self.authenticate_with_cookies()
+        self.client.get(self.url)
+        old_key = hls_playlist_cache_key(self.video.id, self.resolution)
+
+        invalidate_video(self.video.id)
+
+        self.assertNotEqual(hls_playlist_cache_key(self.video.id, self.resolution), old_key)
+        self.assertIsNone(cache.get(hls_playlist_cache_key(self.video.id, self.resolution)))
+
+    def test_returns_304_if_etag_matches(self):
+        """Conditional GET with the ETag of the playlist → 304 without body"""
+
+        self.authenticate_with_cookies()
+        response_1 = self.client.get(self.url)
+
+        self.assertEqual(response_1["Cache-Control"], "private, no-cache")
+        self.assertIn("ETag", response_1)
+        self.assertIn("Last-Modified", response_1)
+
+        response_2 = self.client.get(self.url, HTTP_IF_NONE_MATCH=response_1["ETag"])
+
+        self.assertEqual(response_2.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response_2["ETag"], response_1["ETag"])
+
+    def test_master_playlist_returns_200(self):
+        """GET /api/video/<id>/master.m3u8 delivers the master playlist"""
+
+        with open(os.path.join(self.base_dir, "master.m3u8"), "w") as f:
+            f.write("#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=1000\n720p/index.m3u8\n")
+
+        self.authenticate_with_cookies()
+        response = self.client.get(reverse("video_hls_master", args=[self.video.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/vnd.apple.mpegurl")
+        self.assertIn("720p/index.m3u8", response.getvalue().decode())
+        os.remove(os.path.join(self.base_dir, "master.m3u8"))
+
+    def test_master_playlist_returns_404_if_missing(self):
+        """No finished rendition yet → 404"""
+
+        self.authenticate_with_cookies()
+        response = self.client.get(reverse("video_hls_master", args=[self.video.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_returns_304_if_not_modified_since(self):
+        """Conditional GET with If-Modified-Since → 304"""
+
+        self.authenticate_with_cookies()
+        response_1 = self.client.get(self.url)
+        response_2 = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response_1["Last-Modified"])
+
+        self.assertEqual(response_2.status_code, status.HTTP_304_NOT_MODIFIED)
+
 
 @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class VideoHLSSegmentViewTests(APITestCase):
@@ -230,15 +598,19 @@ class VideoHLSSegmentViewTests(APITestCase):
     def _prepare_resolution_directory(cls):
         cls.resolution = "720p"
         cls.base_dir = cls.video.base_dir
-        os.makedirs(os.path.join(cls.base_dir, cls.resolution), exist_ok=True)
+        output_dir = partial_dir(cls.base_dir, cls.resolution)
+        write_rendition(output_dir, [(4.0, 12)])
 
-        cls.segment_name = "segment0.ts"
-        cls.segment_path = os.path.join(cls.base_dir, cls.resolution, cls.segment_name)
-        with open(cls.segment_path, "wb") as f:
+        cls.segment_name = "segment_000.ts"
+        with open(os.path.join(output_dir, cls.segment_name), "wb") as f:
             f.write(b"FAKE-TS-DATA")
+        write_segment_index(output_dir)
+        commit_rendition(cls.base_dir, cls.resolution, profile="fast")
+        cls.segment_path = os.path.join(cls.base_dir, cls.resolution, cls.segment_name)
 
     def setUp(self):
         cache.clear()
+        segment_cache.clear()
 
 
     def authenticate_with_cookies(self):
@@ -278,19 +650,1329 @@ class VideoHLSSegmentViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertIn("Segment not found", response.data["detail"])
 
-    def test_uses_cache_on_second_request(self):
-        """Second request for same segment uses cache"""
+    def test_segment_is_cached_after_second_request(self):
+        """The segment cache admits a segment on its second request and serves the third from memory"""
 
         self.authenticate_with_cookies()
         response_1 = self.client.get(self.url)
-
-        self.assertEqual(response_1.status_code, 200)
-        cache_key = f"hls_segment_{self.video.id}_{self.resolution}_{self.segment_name}"
-        self.assertIsNotNone(cache.get(cache_key))
+        self.assertEqual(segment_cache.stats()["entries"], 0)
 
         response_2 = self.client.get(self.url)
+        self.assertEqual(segment_cache.stats()["entries"], 1)
+
+        response_3 = self.client.get(self.url)
+        self.assertEqual(segment_cache.stats()["hits"], 1)
+
+        data = [b"".join(response.streaming_content) for response in (response_1, response_2, response_3)]
+        self.assertEqual(data, [b"FAKE-TS-DATA"] * 3)
+        self.assertIsNone(cache.get(f"hls_segment_{self.video.id}_{self.resolution}_{self.segment_name}"))
+
+    def test_cached_segment_is_invalidated_when_rendition_is_replaced(self):
+        """A re-committed rendition (new segment index, new video version) is not served from the segment cache"""
+
+        self.authenticate_with_cookies()
+        self.client.get(self.url)
+        self.client.get(self.url)
+
+        output_dir = partial_dir(self.base_dir, self.resolution)
+        write_rendition(output_dir, [(4.0, 18)])
+        with open(os.path.join(output_dir, self.segment_name), "wb") as f:
+            f.write(b"NEW-TS-DATA-LONGER")
+        write_segment_index(output_dir)
+        commit_rendition(self.base_dir, self.resolution, profile="fast")
+        invalidate_hls(self.video.id)
+        response = self.client.get(self.url)
+
+        self.assertEqual(b"".join(response.streaming_content), b"NEW-TS-DATA-LONGER")
+        self._prepare_resolution_directory()
+
+    def test_browser_revalidates_segments_of_a_replaced_rendition(self):
+        """Segments are no-cache: after a re-encode under the same name the old ETag no longer matches"""
+
+        self.authenticate_with_cookies()
+        response_1 = self.client.get(self.url)
+
+        output_dir = partial_dir(self.base_dir, self.resolution)
+        write_rendition(output_dir, [(4.0, 18)])
+        with open(os.path.join(output_dir, self.segment_name), "wb") as f:
+            f.write(b"NEW-TS-DATA-LONGER")
+        write_segment_index(output_dir)
+        commit_rendition(self.base_dir, self.resolution, profile="fast")
+        invalidate_hls(self.video.id)
+        self.addCleanup(self._prepare_resolution_directory)
+        response_2 = self.client.get(self.url, HTTP_IF_NONE_MATCH=response_1["ETag"])
+
+        self.assertEqual(response_1["Cache-Control"], "private, no-cache")
+        self.assertEqual(response_2.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(response_2.streaming_content), b"NEW-TS-DATA-LONGER")
+
+    def test_segment_index_lists_sizes_durations_and_offsets(self):
+        """The index written before the commit describes every segment in playlist order"""
+
+        output_dir = os.path.join(self.base_dir, "480p")
+        write_rendition(output_dir, [(4.0, 10), (2.5, 7)])
+
+        index = build_segment_index(output_dir)
+
+        self.assertEqual(index["segments"], [["segment_000.ts", 10, 4.0, 0], ["segment_001.ts", 7, 2.5, 10]])
+        shutil.rmtree(output_dir)
+
+    def test_single_file_rendition_is_served_by_byte_range(self):
+        """HLS_SINGLE_FILE: the ranges of the playlist are read from the media file, never put into the segment cache"""
+
+        output_dir = partial_dir(self.base_dir, "480p")
+        write_single_file_rendition(output_dir, [(4.0, 100), (2.0, 50)])
+        index = write_segment_index(output_dir)
+        commit_rendition(self.base_dir, "480p", profile="fast")
+        self.addCleanup(shutil.rmtree, os.path.join(self.base_dir, "480p"))
+
+        self.authenticate_with_cookies()
+        url = reverse("video_hls_segment", args=[self.video.id, "480p", "media.ts"])
+        responses = [self.client.get(url, HTTP_RANGE="bytes=100-149") for _ in range(3)]
+
+        self.assertEqual(index["segments"], [["media.ts", 100, 4.0, 0], ["media.ts", 50, 2.0, 100]])
+        self.assertEqual(responses[2].status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b"".join(responses[2].streaming_content), bytes(i % 251 for i in range(100, 150)))
+        self.assertEqual(responses[2]["Content-Range"], "bytes 100-149/150")
+        self.assertEqual(segment_cache.stats()["entries"], 0)
+
+    def test_segment_is_served_from_the_index_without_stat(self):
+        """Size and validators come from the cached segment index, the file is only opened"""
+
+        self.authenticate_with_cookies()
+        self.client.get(self.url)
+
+        with patch("os.stat") as stat, patch("os.path.exists") as exists:
+            response = self.client.get(self.url)
+
+        stat.assert_not_called()
+        exists.assert_not_called()
+        self.assertEqual(response["Content-Length"], "12")
+
+    def test_invalid_names_are_rejected_before_any_lookup(self):
+        """Unknown resolutions and names the transcoder never writes → 404 without loading video or index"""
+
+        self.authenticate_with_cookies()
+        self.client.get(self.url)
+
+        for resolution, name in (("999p", self.segment_name), (self.resolution, "index.m3u8"), (self.resolution, "segment_000.ts.bak")):
+            with patch("video_app.api.views.video_meta") as meta, patch("video_app.api.views.rendition_index") as index:
+                response = self.client.get(reverse("video_hls_segment", args=[self.video.id, resolution, name]))
+
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+            meta.assert_not_called()
+            index.assert_not_called()
+
+    def test_cached_lookup_avoids_video_query(self):
+        """Once the video and the user are cached a segment request needs no query"""
+
+        self.authenticate_with_cookies()
+        self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_signed_url_skips_jwt_authentication(self):
+        """A valid segment token replaces the cookies: no user lookup, only the HMAC check"""
+
+        token = segment_token(self.video.id, self.resolution, int(time.time()) + 60)
+        self.client.get(self.url, {"token": token})
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {"token": token})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_invalid_signed_urls_are_rejected(self):
+        """Expired, tampered or foreign tokens (other rendition) fall back to the cookie check → 401 without login"""
+
+        expires = int(time.time()) + 60
+        tokens = [
+            segment_token(self.video.id, self.resolution, int(time.time()) - 1),
+            segment_token(self.video.id, self.resolution, expires).replace(str(expires), str(expires + 3600)),
+            segment_token(self.video.id, "1080p", expires),
+        ]
+
+        for token in tokens:
+            self.assertEqual(self.client.get(self.url, {"token": token}).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stale_meta_write_cannot_hide_a_new_version(self):
+        """A lookup that started before a publish and writes the cache after it still sees the new version"""
+
+        stale_exists = Video.objects.filter(pk=self.video.id).exists()
+        invalidate_hls(self.video.id)
+        cache.set(f"video_meta_{self.video.id}", stale_exists)
+
+        self.assertEqual(video_meta(self.video.id)["version"], video_version(self.video.id))
+
+    def test_returns_404_for_unknown_video(self):
+        """Unknown video id → 404, also when answered from the cached lookup"""
+
+        self.authenticate_with_cookies()
+        bad_url = reverse("video_hls_segment", args=[999999, self.resolution, self.segment_name])
+
+        self.assertEqual(self.client.get(bad_url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(bad_url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_segment_cache_stats_require_admin(self):
+        """GET /api/video/segment-cache/ is only available for staff users"""
+
+        self.authenticate_with_cookies()
+        response = self.client.get(reverse("segment_cache_stats"))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_segment_cache_stats_for_admin(self):
+        """Staff users get the hit/miss/eviction counters"""
+
+        self.client.force_authenticate(User(username="admin", is_staff=True))
+        response = self.client.get(reverse("segment_cache_stats"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {"entries", "bytes", "max_bytes", "hits", "misses", "evictions", "hit_ratio"})
+
+    @override_settings(HLS_DELIVERY_MODE="sendfile")
+    def test_sendfile_mode_streams_file_without_caching(self):
+        """In sendfile mode the segment is streamed from an open file and not cached"""
+
+        self.authenticate_with_cookies()
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual(response["Content-Length"], str(os.path.getsize(self.segment_path)))
+        self.assertEqual(b"".join(response.streaming_content), b"FAKE-TS-DATA")
+        self.assertEqual(segment_cache.stats()["misses"], 0)
+
+    @override_settings(HLS_DELIVERY_MODE="accel", HLS_ACCEL_HEADER="X-Accel-Redirect", HLS_ACCEL_REDIRECT_PREFIX="/protected-media/")
+    def test_accel_mode_returns_x_accel_redirect(self):
+        """In accel mode only the X-Accel-Redirect header is sent, the body is left to nginx"""
+
+        self.authenticate_with_cookies()
+        response = self.client.get(self.url)
+
+        expected = f"/protected-media/hls/{self.video.id}/{self.resolution}/{self.segment_name}"
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], expected)
+        self.assertEqual(response["Content-Type"], "video/MP2T")
+        self.assertEqual(response.content, b"")
+
+    @override_settings(HLS_DELIVERY_MODE="accel", HLS_ACCEL_HEADER="X-Sendfile")
+    def test_accel_mode_returns_x_sendfile(self):
+        """With X-Sendfile the absolute path is handed to the web server"""
+
+        self.authenticate_with_cookies()
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Sendfile"], self.segment_path)
+
+    @override_settings(HLS_DELIVERY_MODE="accel")
+    def test_accel_mode_returns_404_if_segment_not_found(self):
+        """Missing segments are still answered by Django in accel mode"""
+
+        self.authenticate_with_cookies()
+        bad_url = reverse("video_hls_segment", args=[self.video.id, "720p", "notfound.ts"])
+
+        response = self.client.get(bad_url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(response.has_header("X-Accel-Redirect"))
+
+    def test_returns_206_for_byte_range(self):
+        """Range request → 206 with the requested bytes and Content-Range"""
+
+        self.authenticate_with_cookies()
+        response = self.client.get(self.url, HTTP_RANGE="bytes=5-6")
+
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b"".join(response.streaming_content), b"TS")
+        self.assertEqual(response["Content-Range"], "bytes 5-6/12")
+        self.assertEqual(response["Content-Length"], "2")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_returns_206_for_suffix_range_from_cache(self):
+        """Suffix ranges are served from the cached bytes as well"""
+
+        self.authenticate_with_cookies()
+        self.client.get(self.url)
+        self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-4")
+
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b"".join(response.streaming_content), b"DATA")
+        self.assertEqual(response["Content-Range"], "bytes 8-11/12")
+        self.assertEqual(segment_cache.stats()["hits"], 1)
+
+    @override_settings(HLS_DELIVERY_MODE="sendfile")
+    def test_sendfile_mode_returns_206_for_byte_range(self):
+        """In sendfile mode the range is read straight from the segment file"""
+
+        self.authenticate_with_cookies()
+        response = self.client.get(self.url, HTTP_RANGE="bytes=5-")
+
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b"".join(response.streaming_content), b"TS-DATA")
+        self.assertEqual(response["Content-Range"], "bytes 5-11/12")
+        self.assertEqual(response["Content-Length"], "7")
+
+    def test_returns_416_for_unsatisfiable_range(self):
+        """Range beyond the end of the segment → 416"""
+
+        self.authenticate_with_cookies()
+        response = self.client.get(self.url, HTTP_RANGE="bytes=100-200")
+
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response["Content-Range"], "bytes */12")
+
+    def test_if_range_mismatch_returns_full_segment(self):
+        """A stale If-Range validator → full 200 response instead of a range"""
+
+        self.authenticate_with_cookies()
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-3", HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(response.streaming_content), b"FAKE-TS-DATA")
+
+    @override_settings(HLS_DELIVERY_MODE="sendfile")
+    def test_returns_304_if_etag_matches(self):
+        """Conditional GET with the segment ETag → 304"""
+
+        self.authenticate_with_cookies()
+        response_1 = self.client.get(self.url)
+        response_2 = self.client.get(self.url, HTTP_IF_NONE_MATCH=response_1["ETag"])
+
+        self.assertEqual(response_2.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response_1["Cache-Control"], "private, no-cache")
+
+    def test_serves_cmaf_segments_with_their_content_types(self):
+        """init.mp4 and .m4s segments of fMP4 renditions get the CMAF content types"""
+
+        output_dir = partial_dir(self.base_dir, "1080p")
+        os.makedirs(output_dir)
+        for name in ("init.mp4", "segment_000.m4s"):
+            with open(os.path.join(output_dir, name), "wb") as f:
+                f.write(b"cmaf")
+        with open(os.path.join(output_dir, "index.m3u8"), "w") as f:
+            f.write('#EXTM3U\n#EXT-X-MAP:URI="init.mp4"\n#EXTINF:4.0,\nsegment_000.m4s\n#EXT-X-ENDLIST\n')
+        write_segment_index(output_dir)
+        commit_rendition(self.base_dir, "1080p", profile="fast")
+
+        self.authenticate_with_cookies()
+        for name, content_type in (("init.mp4", "video/mp4"), ("segment_000.m4s", "video/iso.segment")):
+            response = self.client.get(reverse("video_hls_segment", args=[self.video.id, "1080p", name]))
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Type"], content_type)
+
+    def test_does_not_serve_other_files_of_the_rendition(self):
+        """Playlists and the manifest are no segments → 404"""
+
+        self.authenticate_with_cookies()
+        with open(os.path.join(self.base_dir, self.resolution, "index.m3u8"), "w") as f:
+            f.write("#EXTM3U\n")
+
+        response = self.client.get(reverse("video_hls_segment", args=[self.video.id, self.resolution, "index.m3u8"]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+# ffmpeg is mocked and writes no playlist to index.
+@patch("video_app.tasks.write_segment_index", lambda output_dir: None)
+class ConvertVideoHLSTests(SimpleTestCase):
+    """
+    Test suite for the ffmpeg invocation of convert_video_hls (ffmpeg itself is mocked).
+    """
+
+    def setUp(self):
+        self.output_base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_base, ignore_errors=True)
+        self.resolutions = {"480p": "854:480", "720p": "1280:720", "1080p": "1920:1080"}
+        self.source = {"video_id": 1, "input_path": "/in.mp4", "output_base": self.output_base, "profile": "fast", "publish": False, **SOURCE_1080P}
+
+    @override_settings(HLS_TRANSCODE_MODE="split")
+    @patch("video_app.tasks._run_ffmpeg")
+    def test_split_mode_decodes_once(self, run):
+        """The lowest rendition is encoded first, the others by a single ffmpeg process with a split filter graph"""
+
+        timings = _conversion_process(self.source, self.resolutions)
+
+        self.assertEqual(run.call_count, 2)
+        first, second = (call.args for call in run.call_args_list)
+        self.assertEqual(first[2], ["480p"])
+        command, _, renditions = second
+        self.assertIn("-progress", command)
+        self.assertEqual(renditions, ["720p", "1080p"])
+        graph = command[command.index("-filter_complex") + 1]
+        self.assertTrue(graph.startswith("[0:v]split=2[v0][v1]"))
+        self.assertIn("[v1]scale=1920:1080[v1out]", graph)
+        self.assertEqual(command.count("-hls_segment_filename"), 2)
+        self.assertEqual(list(timings), ["480p", "720p", "1080p"])
+
+    @override_settings(HLS_TRANSCODE_MODE="sequential")
+    @patch("video_app.tasks._run_ffmpeg")
+    def test_lowest_rendition_is_encoded_first(self, run):
+        """The ladder order in the settings does not matter, 480p always comes first"""
+
+        _conversion_process(self.source, {"1080p": "1920:1080", "480p": "854:480", "720p": "1280:720"})
+
+        self.assertEqual([call.args[2] for call in run.call_args_list], [["480p"], ["720p"], ["1080p"]])
+
+    @override_settings(HLS_TRANSCODE_MODE="pool", HLS_TRANSCODE_WORKERS=2)
+    @patch("video_app.tasks._run_ffmpeg")
+    def test_pool_mode_runs_one_process_per_missing_rendition(self, run):
+        """Pool mode starts one ffmpeg per rendition and skips finished ones"""
+
+        commit_fake_rendition(self.output_base, "480p", [(4.0, 100)])
+
+        timings = _conversion_process(self.source, self.resolutions)
+
+        self.assertEqual(run.call_count, 2)
+        scales = sorted(call.args[0][call.args[0].index("-vf") + 1] for call in run.call_args_list)
+        self.assertEqual(scales, ["scale=1280:720", "scale=1920:1080"])
+        self.assertEqual(set(timings), {"720p", "1080p"})
+
+    @override_settings(HLS_TRANSCODE_MODE="sequential", HLS_GOP_SECONDS=2)
+    @patch("video_app.tasks._run_ffmpeg")
+    def test_encoding_args_follow_ladder_profile_and_source_fps(self, run):
+        """Preset/CRF come from the profile, maxrate/bufsize from the ladder, the GOP from the fps"""
+
+        _conversion_process({**self.source, "profile": "quality", "fps": 29.97}, {"720p": "1280:720"})
+
+        command = run.call_args.args[0]
+        option = lambda name: command[command.index(name) + 1]
+        self.assertEqual((option("-preset"), option("-crf"), option("-profile:v")), ("slow", "20", "high"))
+        self.assertEqual((option("-maxrate"), option("-bufsize"), option("-b:a")), ("2800k", "5600k", "128k"))
+        self.assertEqual((option("-g"), option("-keyint_min")), ("60", "60"))
+
+    @override_settings(HLS_TRANSCODE_MODE="sequential")
+    @patch("video_app.tasks._run_ffmpeg")
+    def test_interrupted_renditions_are_encoded_again(self, run):
+        """A partial directory or a playlist without manifest entry (killed worker) is not treated as complete"""
+
+        commit_fake_rendition(self.output_base, "480p", [(4.0, 100)])
+        write_rendition(partial_dir(self.output_base, "720p"), [(4.0, 100)])
+        write_rendition(os.path.join(self.output_base, "1080p"), [(4.0, 100)])
+
+        def encode(command, source, renditions):
+            self.assertEqual(os.listdir(partial_dir(self.output_base, renditions[0])), [])
+            write_rendition(partial_dir(self.output_base, renditions[0]), [(4.0, 200)])
+
+        run.side_effect = encode
+        _conversion_process(self.source, self.resolutions)
+
+        self.assertEqual([call.args[2] for call in run.call_args_list], [["720p"], ["1080p"]])
+        self.assertEqual(completed_renditions(self.output_base), {"480p", "720p", "1080p"})
+        self.assertFalse(os.path.exists(partial_dir(self.output_base, "720p")))
+        self.assertEqual(os.path.getsize(os.path.join(self.output_base, "1080p", "segment_000.ts")), 200)
+
+    def test_truncated_rendition_is_not_complete(self):
+        """A segment that no longer matches the recorded size invalidates the rendition"""
+
+        commit_fake_rendition(self.output_base, "480p", [(4.0, 100), (4.0, 100)])
+        with open(os.path.join(self.output_base, "480p", "segment_001.ts"), "wb") as f:
+            f.write(b"x" * 10)
+
+        self.assertEqual(completed_renditions(self.output_base), set())
+        self.assertFalse(verify_rendition(self.output_base, "480p"))
+
+    @override_settings(HLS_TRANSCODE_MODE="sequential", HLS_SEGMENT_TYPE="fmp4")
+    @patch("video_app.tasks._run_ffmpeg")
+    def test_fmp4_mode_writes_cmaf_segments(self, run):
+        """fMP4 mode muxes .m4s segments with an init segment"""
+
+        _conversion_process(self.source, {"480p": "854:480"})
+
+        command = run.call_args.args[0]
+        self.assertEqual(command[command.index("-hls_segment_type") + 1], "fmp4")
+        self.assertEqual(command[command.index("-hls_fmp4_init_filename") + 1], "init.mp4")
+        self.assertTrue(command[command.index("-hls_segment_filename") + 1].endswith("segment_%03d.m4s"))
+
+    @override_settings(HLS_TRANSCODE_MODE="sequential", HLS_SEGMENT_TYPE="mpegts", HLS_SINGLE_FILE=True)
+    @patch("video_app.tasks._run_ffmpeg")
+    def test_single_file_mode_writes_one_media_file(self, run):
+        """HLS_SINGLE_FILE muxes every rendition into media.ts with a byte-range playlist"""
+
+        _conversion_process(self.source, {"480p": "854:480"})
+
+        command = run.call_args.args[0]
+        self.assertEqual(command[command.index("-hls_flags") + 1], "single_file")
+        self.assertTrue(command[command.index("-hls_segment_filename") + 1].endswith("media.ts"))
+
+    @patch("video_app.tasks.get_current_job")
+    def test_timings_are_stored_in_job_meta(self, get_current_job):
+        """Per-rendition timings end up in the RQ job meta"""
+
+        current_job = get_current_job.return_value
+        current_job.meta = {}
+
+        _report_timings({"480p": 1.5})
+
+        self.assertEqual(current_job.meta["timings"], {"480p": 1.5})
+        current_job.save_meta.assert_called_once()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), HLS_TRANSCODE_MODE="fanout", HLS_RENDITION_TIMEOUT=600)
+@patch("video_app.tasks.write_segment_index", lambda output_dir: None)
+class VideoPipelineTests(TestCase):
+    """
+    Test suite for the fan-out pipeline of convert_video_hls (RQ queue and ffmpeg are mocked).
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    @patch("video_app.signals.convert_video_hls.delay", lambda x: None)
+    def setUpTestData(cls):
+        dummy_file = SimpleUploadedFile("test_video.mp4", b"file_content", content_type="video/mp4")
+        cls.video = Video.objects.create(title="Pipeline Video", video_file=dummy_file)
+
+    def setUp(self):
+        shutil.rmtree(self.video.base_dir, ignore_errors=True)
+
+    @patch("video_app.tasks.probe_source", lambda path: SOURCE_1080P)
+    @patch("video_app.tasks.django_rq.get_queue")
+    def test_enqueues_one_job_per_rendition_and_dependent_finalize(self, get_queue):
+        """One job per missing rendition, finalize_hls depends on all of them"""
+
+        queue = get_queue.return_value
+        convert_video_hls(self.video.id)
+
+        calls = queue.enqueue.call_args_list
+        self.assertEqual([call.args for call in calls[:3]], [
+            (transcode_rendition, self.video.id, "480p"),
+            (transcode_rendition, self.video.id, "720p"),
+            (transcode_rendition, self.video.id, "1080p"),
+        ])
+        self.assertTrue(all(call.kwargs["job_timeout"] == 600 for call in calls[:3]))
+        self.assertEqual(calls[3].args, (finalize_hls, self.video.id))
+        self.assertEqual(calls[3].kwargs["depends_on"], [queue.enqueue.return_value] * 3)
+        self.assertEqual(calls[4].args, (create_trickplay, self.video.id))
+        self.assertEqual(Video.objects.get(id=self.video.id).status, Video.Status.PROCESSING)
+
+    @patch("video_app.utils.ffprobe", lambda path: FFPROBE_720P)
+    @patch("video_app.tasks.probe_source", lambda path: SOURCE_1080P)
+    @patch("video_app.tasks._run_ffmpeg")
+    def test_transcode_rendition_converts_only_its_resolution(self, run):
+        """A rendition job runs exactly one ffmpeg for its own resolution"""
+
+        transcode_rendition(self.video.id, "720p")
+
+        command = run.call_args.args[0]
+        self.assertEqual(run.call_count, 1)
+        self.assertEqual(command[command.index("-vf") + 1], "scale=1280:720")
+
+    @patch("video_app.utils.ffprobe", lambda path: FFPROBE_720P)
+    @patch("video_app.tasks.probe_source", lambda path: SOURCE_1080P)
+    @patch("video_app.tasks._run_ffmpeg")
+    def test_finished_rendition_is_published_at_once(self, run):
+        """A finished rendition job rewrites master.m3u8 and switches the playlists to a new cache generation"""
+
+        run.side_effect = lambda command, source, renditions: write_rendition(partial_dir(source["output_base"], renditions[0]), [(4.0, 1000)])
+        version = video_version(self.video.id)
+
+        with patch("video_app.tasks.invalidate_hls", wraps=invalidate_hls) as invalidate:
+            transcode_rendition(self.video.id, "480p")
+
+        with open(os.path.join(self.video.base_dir, "master.m3u8")) as f:
+            self.assertIn("480p/index.m3u8", f.read())
+        self.assertNotEqual(video_version(self.video.id), version)
+        invalidate.assert_called_once_with(self.video.id)
+        self.assertEqual([name for name in os.listdir(self.video.base_dir) if name.startswith(".tmp-")], [])
+
+    def test_master_is_built_under_the_manifest_lock(self):
+        """Concurrent publishers cannot interleave scan and write of master.m3u8"""
+
+        os.makedirs(self.video.base_dir)
+
+        def build(output_base, resolutions, directories):
+            with open(os.path.join(output_base, ".manifest.lock"), "w") as lock:
+                with self.assertRaises(BlockingIOError):
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return "#EXTM3U\n"
+
+        with patch("video_app.tasks.build_master_playlist", side_effect=build) as build_master:
+            finalize_hls(self.video.id)
+
+        build_master.assert_called_once()
+
+    @patch("video_app.utils.ffprobe", lambda path: FFPROBE_720P)
+    @patch("video_app.tasks.get_current_job")
+    def test_finalize_writes_master_and_collects_timings(self, get_current_job):
+        """finalize_hls writes master.m3u8 and collects the rendition timings from the manifest"""
+
+        for res, seconds in (("480p", 1.0), ("720p", 2.0)):
+            write_rendition(partial_dir(self.video.base_dir, res), [(4.0, 1000)])
+            commit_rendition(self.video.base_dir, res, profile="fast", seconds=seconds)
+        current_job = get_current_job.return_value
+        current_job.meta = {}
+        version = video_version(self.video.id)
+
+        finalize_hls(self.video.id)
+
+        self.assertTrue(os.path.exists(os.path.join(self.video.base_dir, "master.m3u8")))
+        self.assertNotEqual(video_version(self.video.id), version)
+        self.assertEqual(current_job.meta["timings"], {"480p": 1.0, "720p": 2.0})
+        self.assertEqual(Video.objects.get(id=self.video.id).status, Video.Status.READY)
+
+    @override_settings(HLS_TRANSCODE_MODE="sequential")
+    @patch("video_app.tasks.probe_source", lambda path: SOURCE_1080P)
+    @patch("video_app.tasks._run_ffmpeg", side_effect=subprocess.CalledProcessError(1, "ffmpeg"))
+    def test_failed_conversion_sets_status_failed(self, run):
+        """An ffmpeg error marks the video as failed and is re-raised for RQ"""
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            convert_video_hls(self.video.id)
+
+        self.assertEqual(Video.objects.get(id=self.video.id).status, Video.Status.FAILED)
+
+    @override_settings(HLS_TRANSCODE_MODE="sequential", HLS_QUALITY_REENCODE=True, HLS_ENCODING_PROFILE="fast")
+    @patch("video_app.tasks.probe_source", lambda path: {**SOURCE_1080P, "height": 480})
+    @patch("video_app.tasks._run_ffmpeg")
+    @patch("video_app.tasks.django_rq.get_queue")
+    def test_fast_encode_enqueues_quality_reencode(self, get_queue, run):
+        """Once the fast encode is online the quality re-encode is queued"""
+
+        convert_video_hls(self.video.id)
+
+        self.assertEqual(run.call_args.args[1]["profile"], "fast")
+        self.assertEqual(get_queue.return_value.enqueue.call_args.args, (reencode_hls, self.video.id))
+
+    @patch("video_app.utils.ffprobe", lambda path: FFPROBE_720P)
+    @patch("video_app.tasks.probe_source", lambda path: SOURCE_1080P)
+    @patch("video_app.tasks._run_ffmpeg")
+    @patch("video_app.tasks.django_rq.get_queue")
+    def test_reencode_publishes_new_rendition_directories(self, get_queue, run):
+        """The quality encode is published next to the online renditions, which stay untouched until pruned"""
+
+        def encode(command, source, renditions):
+            write_rendition(partial_dir(source["output_base"], renditions[0]), [(4.0, 500)])
+
+        run.side_effect = encode
+        commit_fake_rendition(self.video.base_dir, "720p", [(4.0, 1000)])
+        list_key, version = video_list_cache_key(), video_version(self.video.id)
+
+        reencode_hls(self.video.id)
+
+        name = read_manifest(self.video.base_dir)["renditions"]["720p"]["dir"]
+        self.assertRegex(name, r"^720p\.\d+$")
+        self.assertEqual(video_list_cache_key(), list_key)
+        self.assertNotEqual(video_version(self.video.id), version)
+        self.assertEqual([call.args[2] for call in run.call_args_list], [["720p"]])
+        self.assertEqual(run.call_args.args[1]["profile"], "quality")
+        self.assertEqual(os.path.getsize(os.path.join(self.video.base_dir, name, "segment_000.ts")), 500)
+        self.assertEqual(os.path.getsize(os.path.join(self.video.base_dir, "720p", "segment_000.ts")), 1000)
+        self.assertFalse(os.path.exists(os.path.join(self.video.base_dir, ".quality")))
+        self.assertEqual(read_manifest(self.video.base_dir)["renditions"]["720p"]["profile"], "quality")
+        self.assertTrue(verify_rendition(self.video.base_dir, "720p"))
+        with open(os.path.join(self.video.base_dir, "master.m3u8")) as f:
+            self.assertIn(f"{name}/index.m3u8", f.read())
+
+        enqueue_in = get_queue.return_value.enqueue_in
+        self.assertEqual(enqueue_in.call_args.args[1:], (prune_hls, self.video.id, ["720p"]))
+        prune_hls(self.video.id, ["720p"])
+        self.assertFalse(os.path.exists(os.path.join(self.video.base_dir, "720p")))
+        self.assertTrue(os.path.exists(os.path.join(self.video.base_dir, name)))
+
+    def test_prune_keeps_directories_the_manifest_publishes_again(self):
+        """A re-upload encodes to 720p again before the delayed prune runs: the new rendition stays"""
+
+        commit_fake_rendition(self.video.base_dir, "720p", [(4.0, 1000)])
+
+        prune_hls(self.video.id, ["720p"])
+
+        self.assertEqual(completed_renditions(self.video.base_dir), {"720p"})
+
+    def test_rendition_directory_names(self):
+        """Only ladder directories, optionally with a revision, count as renditions"""
+
+        self.assertEqual(rendition_resolution("720p"), "720p")
+        self.assertEqual(rendition_resolution("720p.1760000000000000"), "720p")
+        for name in (".720p.partial", ".quality", "720p.", "720p.old", "720p.1.2"):
+            self.assertIsNone(rendition_resolution(name), name)
+
+    @override_settings(HLS_TRICKPLAY={"ENABLED": False})
+    @patch("video_app.tasks.probe_source", lambda path: SOURCE_1080P)
+    @patch("video_app.tasks.django_rq.get_queue")
+    def test_trickplay_can_be_disabled(self, get_queue):
+        """Without HLS_TRICKPLAY["ENABLED"] no trickplay job is queued"""
+
+        convert_video_hls(self.video.id)
+
+        self.assertNotIn(create_trickplay, [call.args[0] for call in get_queue.return_value.enqueue.call_args_list])
+
+    @override_settings(HLS_TRICKPLAY={"ENABLED": True, "INTERVAL": 4, "WIDTH": 160, "COLUMNS": 2, "ROWS": 2})
+    @patch("video_app.tasks.probe_source", lambda path: SOURCE_1080P)
+    @patch("video_app.tasks.subprocess.run")
+    def test_create_trickplay_writes_sprites_and_vtt(self, run):
+        """Sprite sheets and the WebVTT index are moved into media/hls/<id>/trickplay/ together"""
+
+        def encode(command, check):
+            open(command[-1] % 0, "wb").close()
+
+        run.side_effect = encode
+        create_trickplay(self.video.id)
+
+        command = run.call_args.args[0]
+        self.assertIn("fps=1/4,scale=160:90,tpad=stop_mode=clone:stop=3,tile=2x2", command)
+        trickplay_dir = os.path.join(self.video.base_dir, "trickplay")
+        self.assertEqual(sorted(os.listdir(trickplay_dir)), ["sprite_000.jpg", "thumbnails.vtt"])
+        with open(os.path.join(trickplay_dir, "thumbnails.vtt")) as f:
+            self.assertIn("00:00:08.000 --> 00:00:10.000\nsprite_000.jpg#xywh=0,90,160,90", f.read())
+
+    @patch("video_app.tasks.probe_source", lambda path: SOURCE_1080P)
+    @patch("video_app.tasks.subprocess.run", side_effect=subprocess.CalledProcessError(1, "ffmpeg"))
+    def test_failed_trickplay_leaves_nothing_behind(self, run):
+        """A failed sprite encode is only logged, the video stays playable"""
+
+        create_trickplay(self.video.id)
+
+        self.assertEqual(os.listdir(self.video.base_dir), [])
+
+    @patch("video_app.tasks.probe_source", side_effect=InvalidVideoError("corrupt.mp4 has no video stream with a duration."))
+    @patch("video_app.tasks._run_ffmpeg")
+    def test_corrupt_source_is_rejected_before_encoding(self, run, probe):
+        """A file ffprobe cannot read fails the video without starting ffmpeg"""
+
+        convert_video_hls(self.video.id)
+
+        run.assert_not_called()
+        self.assertEqual(Video.objects.get(id=self.video.id).status, Video.Status.FAILED)
+
+    @patch("video_app.tasks.probe_source", side_effect=ProbeUnavailableError("ffprobe could not be started"))
+    @patch("video_app.tasks._run_ffmpeg")
+    def test_missing_ffprobe_fails_the_job(self, run, probe):
+        """A worker without ffprobe does not reject the upload silently: the job fails and can be retried"""
+
+        with self.assertRaises(ProbeUnavailableError):
+            convert_video_hls(self.video.id)
+
+        run.assert_not_called()
+        self.assertEqual(Video.objects.get(id=self.video.id).status, Video.Status.FAILED)
+
+    @override_settings(HLS_TRANSCODE_MODE="sequential")
+    @patch("video_app.tasks.probe_source", lambda path: {**SOURCE_1080P, "height": 480})
+    @patch("video_app.tasks._run_ffmpeg")
+    def test_probe_results_are_stored_on_the_video(self, run):
+        """Duration, resolution, fps, codecs and bitrate end up on the model"""
+
+        convert_video_hls(self.video.id)
+
+        video = Video.objects.get(id=self.video.id)
+        self.assertEqual((video.duration, video.height, video.fps), (10.0, 480, 25.0))
+        self.assertEqual((video.video_codec, video.audio_codec, video.bitrate), ("h264", "aac", 5000000))
+
+    def test_failed_rendition_job_sets_status_failed(self):
+        """The on_failure callback of a rendition job marks the video as failed"""
+
+        _rendition_failed(type("Job", (), {"args": (self.video.id, "720p")})(), None, None, None, None)
+
+        self.assertEqual(Video.objects.get(id=self.video.id).status, Video.Status.FAILED)
+
+
+class MasterPlaylistTests(SimpleTestCase):
+    """
+    Test suite for the master playlist built from the finished renditions (ffprobe is mocked).
+    """
+
+    def setUp(self):
+        self.output_base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_base, ignore_errors=True)
+        self.resolutions = {"480p": "854:480", "720p": "1280:720", "1080p": "1920:1080"}
+
+    @patch("video_app.utils.ffprobe", lambda path: FFPROBE_720P)
+    def test_lists_only_existing_renditions_with_measured_bitrates(self):
+        """Peak and average bandwidth come from segment sizes and durations"""
+
+        write_rendition(os.path.join(self.output_base, "720p"), [(4.0, 1000), (2.0, 1000)])
+
+        content = build_master_playlist(self.output_base, self.resolutions)
+
+        self.assertIn('BANDWIDTH=4000,AVERAGE-BANDWIDTH=2667,RESOLUTION=1280x720,CODECS="avc1.4d001f,mp4a.40.2"', content)
+        self.assertIn("720p/index.m3u8", content)
+        self.assertNotIn("480p", content)
+        self.assertNotIn("1080p", content)
+
+    @patch("video_app.utils.ffprobe")
+    def test_cmaf_renditions_are_probed_via_init_segment(self, ffprobe):
+        """fMP4 media segments carry no codec configuration: codecs come from init.mp4, the master is version 7"""
+
+        ffprobe.return_value = FFPROBE_720P
+        output_dir = os.path.join(self.output_base, "720p")
+        write_rendition(output_dir, [(4.0, 1000)])
+        open(os.path.join(output_dir, "init.mp4"), "wb").close()
+
+        content = build_master_playlist(self.output_base, self.resolutions)
+
+        ffprobe.assert_called_once_with(os.path.join(output_dir, "init.mp4"))
+        self.assertIn("#EXT-X-VERSION:7", content)
+
+    @patch("video_app.utils.ffprobe")
+    def test_single_file_renditions_are_measured_by_byte_range(self, ffprobe):
+        """Bitrates come from the EXT-X-BYTERANGE lengths, codecs from the file holding the init range"""
+
+        ffprobe.return_value = FFPROBE_720P
+        output_dir = os.path.join(self.output_base, "720p")
+        write_single_file_rendition(output_dir, [(4.0, 1000), (2.0, 1000)], init_size=200)
+
+        content = build_master_playlist(self.output_base, self.resolutions)
+
+        ffprobe.assert_called_once_with(os.path.join(output_dir, "media.m4s"))
+        self.assertIn("BANDWIDTH=4000,AVERAGE-BANDWIDTH=2667", content)
+        self.assertIn("#EXT-X-VERSION:7", content)
+
+    def test_returns_none_without_finished_rendition(self):
+        """No rendition → no master playlist"""
+
+        self.assertIsNone(build_master_playlist(self.output_base, self.resolutions))
+
+    def test_skips_renditions_above_source_resolution(self):
+        """A 720p source is not upscaled to 1080p"""
+
+        self.assertEqual(list(renditions_for_source(self.resolutions, 720)), ["480p", "720p"])
+
+    def test_keeps_lowest_rendition_for_tiny_sources(self):
+        """Sources below the lowest rendition still get one rendition"""
+
+        self.assertEqual(list(renditions_for_source(self.resolutions, 240)), ["480p"])
+
+    @patch("video_app.utils.ffprobe", side_effect=subprocess.CalledProcessError(1, "ffprobe"))
+    def test_probe_rejects_unreadable_files(self, ffprobe):
+        """ffprobe errors become InvalidVideoError"""
+
+        with self.assertRaises(InvalidVideoError):
+            probe_source("/in.mp4")
+
+    @patch("video_app.utils.ffprobe", side_effect=FileNotFoundError(2, "No such file or directory", "ffprobe"))
+    def test_missing_ffprobe_is_an_explicit_error(self, ffprobe):
+        """A missing ffprobe binary raises ProbeUnavailableError, not OSError"""
+
+        with self.assertRaises(ProbeUnavailableError):
+            probe_source("/in.mp4")
+
+    @patch("video_app.utils.ffprobe", lambda path: {"streams": [FFPROBE_720P["streams"][1]], "format": {"duration": "10.0"}})
+    def test_probe_rejects_files_without_video_stream(self):
+        """An audio-only file is no video"""
+
+        with self.assertRaises(InvalidVideoError):
+            probe_source("/in.mp4")
+
+    @patch("video_app.utils.ffprobe", lambda path: {**FFPROBE_720P, "format": {"duration": "12.5", "bit_rate": "2500000"}})
+    def test_probe_returns_source_properties(self):
+        """Codecs come from the streams, duration and bitrate from the container"""
+
+        FFPROBE_720P["streams"][0]["avg_frame_rate"] = "30000/1001"
+        self.addCleanup(FFPROBE_720P["streams"][0].pop, "avg_frame_rate")
+
+        self.assertEqual(probe_source("/in.mp4"), {
+            "duration": 12.5, "width": 1280, "height": 720, "fps": 29.97,
+            "video_codec": "h264", "audio_codec": "aac", "bitrate": 2500000,
+        })
+
+    def test_trickplay_vtt_maps_intervals_to_tiles(self):
+        """Tiles fill a sheet row by row, the last cue ends with the video"""
+
+        vtt = build_trickplay_vtt(25.0, 10, 160, 90, 2, 1)
+
+        self.assertTrue(vtt.startswith("WEBVTT\n\n00:00:00.000 --> 00:00:10.000\nsprite_000.jpg#xywh=0,0,160,90\n"))
+        self.assertIn("00:00:10.000 --> 00:00:20.000\nsprite_000.jpg#xywh=160,0,160,90\n", vtt)
+        self.assertIn("00:00:20.000 --> 00:00:25.000\nsprite_001.jpg#xywh=0,0,160,90\n", vtt)
+
+    def test_codecs_string_for_high_profile(self):
+        """High profile level 4.0 → avc1.640028"""
+
+        probe = {"streams": [{"codec_type": "video", "codec_name": "h264", "profile": "High", "level": 40}]}
+
+        self.assertEqual(codecs_string(probe), "avc1.640028")
+
+
+class ProgressReporterTests(SimpleTestCase):
+    """
+    Test suite for the parsing of `ffmpeg -progress` output.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_parse_computes_percent_and_eta(self):
+        """Position and speed of the block give percent and remaining seconds"""
+
+        block = {"out_time_us": "5000000", "fps": "48.5", "speed": "1.25x"}
+
+        self.assertEqual(ProgressReporter.parse(block, 10.0), {"percent": 50.0, "fps": 48.5, "eta": 4})
+
+    def test_parse_without_duration_has_no_eta(self):
+        """Unknown duration (e.g. probe failed) → 0 % and no ETA"""
+
+        block = {"out_time_us": "5000000", "speed": "N/A"}
+
+        self.assertEqual(ProgressReporter.parse(block, 0), {"percent": 0.0, "fps": 0.0, "eta": None})
+
+    def test_parse_skips_blocks_without_position(self):
+        """out_time_us=N/A (encoder still buffering) keeps the last stored progress"""
+
+        self.assertIsNone(ProgressReporter.parse({"out_time_us": "N/A", "speed": "N/A"}, 10.0))
+
+    def test_feed_stores_progress_for_all_renditions_of_the_process(self):
+        """A finished block is written for every rendition encoded by the process"""
+
+        reporter = ProgressReporter(7, ["480p", "720p"], 10.0)
+        for line in ["frame=250\n", "fps=50.0\n", "out_time_us=10000000\n", "progress=end\n"]:
+            reporter.feed(line)
+
+        progress = get_progress(7, ["480p", "720p", "1080p"])
+        self.assertEqual(set(progress), {"480p", "720p"})
+        self.assertEqual(progress["720p"]["percent"], 100.0)
+
+    def test_feed_is_throttled(self):
+        """Intermediate blocks within the update interval are not written"""
+
+        reporter = ProgressReporter(7, ["480p"], 10.0)
+        for position in ("1000000", "2000000"):
+            reporter.feed(f"out_time_us={position}\n")
+            reporter.feed("progress=continue\n")
+
+        self.assertEqual(get_progress(7, ["480p"])["480p"]["percent"], 10.0)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class VideoStatusViewTests(APITestCase):
+    """
+    Test suite for /api/video/<movie_id>/status/.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    @patch("video_app.signals.convert_video_hls.delay", lambda x: None)
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="statususer@example.com", password="Pass123!", email="statususer@example.com")
+        dummy_file = SimpleUploadedFile("test_video.mp4", b"file_content", content_type="video/mp4")
+        cls.video = Video.objects.create(title="Status Video", video_file=dummy_file)
+        cls.access_token = str(RefreshToken.for_user(cls.user).access_token)
+
+    def setUp(self):
+        cache.clear()
+        self.client.cookies["access_token"] = self.access_token
+
+    def test_returns_status_and_progress(self):
+        """A new upload is queued, progress comes from the cache"""
+
+        ProgressReporter(self.video.id, ["480p"], 10.0)._update(finished=True)
+
+        response = self.client.get(reverse("video_status", args=[self.video.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], Video.Status.QUEUED)
+        self.assertEqual(response.data["progress"]["480p"]["percent"], 100.0)
+
+    def test_published_renditions_are_playable_while_processing(self):
+        """The lowest rendition is reported as soon as it is in the master, before the status is ready"""
+
+        response = self.client.get(reverse("video_status", args=[self.video.id]))
+        self.assertEqual((response.data["renditions"], response.data["playable"]), ([], False))
+
+        output_dir = partial_dir(self.video.base_dir, "480p")
+        write_rendition(output_dir, [(4.0, 10)])
+        commit_rendition(self.video.base_dir, "480p", profile="fast")
+        with open(os.path.join(self.video.base_dir, "master.m3u8"), "w") as f:
+            f.write("#EXTM3U\n480p/index.m3u8\n")
+
+        response = self.client.get(reverse("video_status", args=[self.video.id]))
+
+        self.assertEqual(response.data["renditions"], ["480p"])
+        self.assertTrue(response.data["playable"])
+
+    def test_returns_404_for_unknown_video(self):
+        """Unknown video id → 404"""
+
+        response = self.client.get(reverse("video_status", args=[9999]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class VideoTrickplayViewTests(APITestCase):
+    """
+    Test suite for /api/video/<movie_id>/trickplay/<name>.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    @patch("video_app.signals.convert_video_hls.delay", lambda x: None)
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="trickuser@example.com", password="Pass123!", email="trickuser@example.com")
+        dummy_file = SimpleUploadedFile("test_video.mp4", b"file_content", content_type="video/mp4")
+        cls.video = Video.objects.create(title="Trickplay Video", video_file=dummy_file)
+        cls.access_token = str(RefreshToken.for_user(cls.user).access_token)
+
+        trickplay_dir = os.path.join(cls.video.base_dir, "trickplay")
+        os.makedirs(trickplay_dir)
+        for name, content in (("thumbnails.vtt", b"WEBVTT\n"), ("sprite_000.jpg", b"jpeg"), ("notes.txt", b"x")):
+            with open(os.path.join(trickplay_dir, name), "wb") as f:
+                f.write(content)
+
+    def setUp(self):
+        cache.clear()
+        self.client.cookies["access_token"] = self.access_token
+
+    def test_serves_vtt_and_sprites(self):
+        """The WebVTT track and the sprite sheets get their content types"""
+
+        for name, content_type in (("thumbnails.vtt", "text/vtt"), ("sprite_000.jpg", "image/jpeg")):
+            response = self.client.get(reverse("video_trickplay", args=[self.video.id, name]))
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response["Content-Type"], content_type)
+
+    def test_returns_404_for_other_files(self):
+        """Only the track and sprite_<n>.jpg are served"""
+
+        for name in ("notes.txt", "sprite_001.jpg"):
+            response = self.client.get(reverse("video_trickplay", args=[self.video.id, name]))
+
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(HLS_SEGMENT_CACHE={"MAX_BYTES": 10, "ADMIT_AFTER": 2})
+class SegmentCacheTests(SimpleTestCase):
+    """
+    Test suite for the byte-budget LRU segment cache.
+    """
+
+    def setUp(self):
+        self.cache = SegmentCache()
+
+    def test_admits_only_after_second_request(self):
+        """The first miss is only counted, the second one admits the segment"""
+
+        self.assertFalse(self.cache.admit("a", 4))
+        self.assertTrue(self.cache.admit("a", 4))
+
+    def test_rejects_segments_larger_than_budget(self):
+        """Segments that do not fit into the budget are never admitted"""
+
+        self.cache.admit("big", 11)
+        self.assertFalse(self.cache.admit("big", 11))
+
+    def test_evicts_least_recently_used(self):
+        """Exceeding the byte budget evicts the least recently used segment"""
+
+        self.cache.set("a", b"aaaa", '"a"', 0)
+        self.cache.set("b", b"bbbb", '"b"', 0)
+        self.cache.get("a", '"a"')
+        self.cache.set("c", b"cccc", '"c"', 0)
+
+        self.assertIsNone(self.cache.get("b", '"b"'))
+        self.assertIsNotNone(self.cache.get("a", '"a"'))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        self.assertEqual(self.cache.stats()["bytes"], 8)
+
+    def test_miss_on_changed_etag(self):
+        """An entry with a different ETag counts as a miss"""
+
+        self.cache.set("a", b"aaaa", '"a"', 0)
+
+        self.assertIsNone(self.cache.get("a", '"changed"'))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+@patch("video_app.signals.convert_video_hls.delay", lambda x: None)
+class VideoSignalTests(TestCase):
+    """
+    Test suite for the file cleanup in the video signals.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    @patch("video_app.signals.convert_video_hls.delay", lambda x: None)
+    def setUp(self):
+        cache.clear()
+        dummy_file = SimpleUploadedFile("old_video.mp4", b"file_content", content_type="video/mp4")
+        Video.objects.create(title="Signal Video", category="Drama", video_file=dummy_file)
+        self.video = Video.objects.get(title="Signal Video")
+
+    def test_update_does_not_select_the_row_again(self):
+        """pre_save uses the tracked values → the save is a single UPDATE"""
+
+        self.video.title = "Renamed"
+
+        with self.assertNumQueries(1):
+            self.video.save()
+
+    def test_replacing_video_file_deletes_old_file_and_hls(self):
+        """A new video file removes the old upload and the old HLS output"""
+
+        old_path = self.video.video_file.path
+        os.makedirs(self.video.base_dir, exist_ok=True)
+        self.video.status = Video.Status.READY
+
+        self.video.video_file = SimpleUploadedFile("new_video.mp4", b"new_content", content_type="video/mp4")
+        self.video.save()
+
+        self.assertFalse(os.path.exists(old_path))
+        self.assertFalse(os.path.exists(self.video.base_dir))
+        self.assertTrue(os.path.exists(self.video.video_file.path))
+        self.assertEqual(self.video.status, Video.Status.QUEUED)
+
+    def test_only_new_video_files_are_converted(self):
+        """Metadata changes do not enqueue a conversion, a replaced video file does (with a fresh probe)"""
+
+        # Not a decorator: the class-level patch would be applied on top of it.
+        with patch("video_app.signals.convert_video_hls.delay") as delay:
+            self.video.duration = 10.0
+            self.video.title = "Renamed"
+            self.video.save()
+            delay.assert_not_called()
+
+            self.video.video_file = SimpleUploadedFile("new_video.mp4", b"new_content", content_type="video/mp4")
+            self.video.save()
+
+        delay.assert_called_once_with(self.video.id)
+        self.assertIsNone(self.video.duration)
+
+    @patch("video_app.utils.ffprobe", side_effect=subprocess.CalledProcessError(1, "ffprobe"))
+    def test_corrupt_upload_is_rejected_by_validation(self, ffprobe):
+        """full_clean (admin, model forms) probes new uploads and rejects unreadable files"""
+
+        self.video.video_file = SimpleUploadedFile("corrupt.mp4", b"not a video", content_type="video/mp4")
+
+        with self.assertRaises(ValidationError) as context:
+            self.video.full_clean()
+        self.assertIn("video_file", context.exception.message_dict)
+
+    @patch("video_app.utils.ffprobe", side_effect=FileNotFoundError(2, "No such file or directory", "ffprobe"))
+    def test_missing_ffprobe_is_a_validation_error(self, ffprobe):
+        """Without ffprobe the upload fails with a form error instead of a server error"""
+
+        self.video.video_file = SimpleUploadedFile("video.mp4", b"content", content_type="video/mp4")
+
+        with self.assertRaises(ValidationError) as context:
+            self.video.full_clean()
+        self.assertEqual(context.exception.error_dict["video_file"][0].code, "probe_unavailable")
+
+    @patch("video_app.utils.ffprobe")
+    def test_stored_video_file_is_not_probed_again(self, ffprobe):
+        """Validating an unchanged video does not run ffprobe"""
+
+        self.video.clean_fields(exclude=["description", "thumbnail"])
+
+        ffprobe.assert_not_called()
+
+    def test_untracked_instance_falls_back_to_database(self):
+        """Instances that were not loaded from the database still clean up the old file"""
+
+        old_path = self.video.video_file.path
+        video = Video(pk=self.video.pk, title="Copy", category="Drama", created_at=self.video.created_at)
+        video.video_file = SimpleUploadedFile("other_video.mp4", b"other", content_type="video/mp4")
+        video.save()
+
+        self.assertFalse(os.path.exists(old_path))
+
+    def test_replacing_thumbnail_recreates_variants(self):
+        """A new thumbnail drops the old variants and enqueues new ones, other changes do not"""
+
+        variants_dir = os.path.join(settings.MEDIA_ROOT, variants_dir_name(self.video.id))
+        os.makedirs(variants_dir)
+        Video.objects.filter(pk=self.video.pk).update(thumbnail_variants={"webp": {"320": "old.webp"}})
+        self.video.refresh_from_db()
+
+        with patch("video_app.signals.create_thumbnail_variants.delay") as delay:
+            self.video.title = "Renamed"
+            self.video.save()
+            delay.assert_not_called()
+
+            self.video.thumbnail = SimpleUploadedFile("thumb.png", b"png", content_type="image/png")
+            self.video.save()
+
+        delay.assert_called_once_with(self.video.id)
+        self.assertEqual(self.video.thumbnail_variants, {})
+        self.assertFalse(os.path.exists(variants_dir))
+
+
+def image_upload(name, size, mode="RGB", file_format="PNG"):
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 0) if mode == "RGBA" else (200, 30, 30)).save(buffer, file_format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f"image/{file_format.lower()}")
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    THUMBNAIL_VARIANTS={"WIDTHS": [320, 640, 1280], "FORMATS": ["webp", "jpeg"], "QUALITY": 80},
+)
+@patch("video_app.signals.convert_video_hls.delay", lambda x: None)
+@patch("video_app.signals.create_thumbnail_variants.delay", lambda x: None)
+class ThumbnailVariantTests(TestCase):
+    """
+    Test suite for the resized WebP/JPEG thumbnails and their srcset map.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def create_video(self, thumbnail):
+        dummy_file = SimpleUploadedFile("video.mp4", b"file_content", content_type="video/mp4")
+        return Video.objects.create(title="Thumb", category="Drama", video_file=dummy_file, thumbnail=thumbnail)
+
+    def test_variants_are_not_upscaled(self):
+        """Only widths up to the original are created, in every format"""
+
+        video = self.create_video(image_upload("thumb.png", (800, 450)))
+
+        variants = create_variants(video)
+
+        self.assertEqual(set(variants), {"webp", "jpeg"})
+        self.assertEqual(list(variants["webp"]), ["320", "640"])
+        with Image.open(os.path.join(settings.MEDIA_ROOT, variants["webp"]["320"])) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (320, 180)))
+
+    def test_small_original_keeps_its_width(self):
+        """An original smaller than every configured width gets a single variant of its own width"""
+
+        video = self.create_video(image_upload("thumb.png", (200, 100)))
+
+        self.assertEqual(list(create_variants(video)["jpeg"]), ["200"])
+
+    def test_transparent_thumbnail_is_flattened_for_jpeg(self):
+        """JPEG has no alpha channel: transparent areas become white, WebP keeps the alpha"""
+
+        video = self.create_video(image_upload("thumb.png", (400, 200), mode="RGBA"))
+
+        variants = create_variants(video)
+
+        with Image.open(os.path.join(settings.MEDIA_ROOT, variants["jpeg"]["320"])) as image:
+            self.assertEqual(image.mode, "RGB")
+            self.assertGreater(min(image.getpixel((10, 10))), 240)
+        with Image.open(os.path.join(settings.MEDIA_ROOT, variants["webp"]["320"])) as image:
+            self.assertIn("A", image.getbands())
+
+    def test_job_stores_variants_for_the_serializer(self):
+        """The job saves the map, the serializer delivers it as {format: {width: URL}}"""
+
+        video = self.create_video(image_upload("thumb.jpg", (1920, 1080), file_format="JPEG"))
+
+        create_thumbnail_variants(video.id)
+
+        video.refresh_from_db()
+        srcset = VideoSerializer(video).data["thumbnail_srcset"]
+        self.assertEqual(list(srcset["webp"]), ["320", "640", "1280"])
+        self.assertTrue(srcset["jpeg"]["320"].startswith(f"/media/thumbnails/variants/{video.id}/320-"))
+
+    def test_unreadable_thumbnail_is_skipped(self):
+        """A file Pillow cannot read leaves the variants empty instead of failing the job"""
+
+        video = self.create_video(SimpleUploadedFile("thumb.jpg", b"jpg", content_type="image/jpeg"))
+
+        create_thumbnail_variants(video.id)
+
+        video.refresh_from_db()
+        self.assertEqual(video.thumbnail_variants, {})
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+@patch("video_app.signals.convert_video_hls.delay", lambda x: None)
+class AsyncHLSViewTests(TestCase):
+    """
+    Test suite for the async playlist and segment views (HLS_ASYNC_VIEWS).
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    @patch("video_app.signals.convert_video_hls.delay", lambda x: None)
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="asyncuser@example.com", password="Pass123!", email="asyncuser@example.com")
+        dummy_file = SimpleUploadedFile("test_video.mp4", b"file_content", content_type="video/mp4")
+        cls.video = Video.objects.create(title="Async Video", video_file=dummy_file)
+        commit_fake_rendition(cls.video.base_dir, "720p", [(4.0, 300000), (2.0, 10)])
+        cls.access_token = str(RefreshToken.for_user(cls.user).access_token)
+
+    def setUp(self):
+        cache.clear()
+        segment_cache.clear()
+        self.factory = AsyncRequestFactory()
+
+    def request(self, path="/", authenticated=True, **extra):
+        request = self.factory.get(path, **extra)
+        if authenticated:
+            request.COOKIES["access_token"] = self.access_token
+        return request
+
+    async def segment(self, request, name="segment_000.ts"):
+        return await AsyncVideoHLSSegmentView.as_view()(request, movie_id=self.video.id, resolution="720p", segment=name)
+
+    async def test_segment_is_streamed_in_chunks(self):
+        """Large segments are read chunk by chunk through an async iterator"""
+
+        response = await self.segment(self.request())
+
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Length"], "300000")
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b"".join(chunks), b"x" * 300000)
+
+    async def test_segment_range_request(self):
+        """Range requests → 206 with the requested bytes"""
+
+        response = await self.segment(self.request(headers={"Range": "bytes=10-19"}))
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/300000")
+        self.assertEqual(b"".join([chunk async for chunk in response.streaming_content]), b"x" * 10)
+
+    async def test_small_segment_is_served_from_the_segment_cache(self):
+        """The second request admits the segment, the third is answered from memory"""
+
+        for _ in range(3):
+            response = await self.segment(self.request(), "segment_001.ts")
+
+        self.assertEqual(response.content, b"x" * 10)
+        self.assertEqual(segment_cache.stats()["hits"], 1)
+
+    async def test_unauthenticated_segment_request_returns_401(self):
+        """Neither cookie nor token → 401"""
+
+        response = await self.segment(self.request(authenticated=False))
+
+        self.assertEqual(response.status_code, 401)
+
+    async def test_playlist_of_unknown_resolution_returns_404(self):
+        """Only the resolutions of the ladder are served, no other directory below the video"""
+
+        response = await AsyncVideoHLSView.as_view()(self.request(), movie_id=self.video.id, resolution=".quality")
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_playlist_is_signed_and_segment_accepts_the_token(self):
+        """The async playlist signs its segment URIs, the token alone authorizes the segment request"""
+
+        response = await AsyncVideoHLSView.as_view()(self.request(), movie_id=self.video.id, resolution="720p")
+        uri = next(line for line in response.content.decode().splitlines() if not line.startswith("#"))
+        query = uri.partition("?")[2]
+
+        segment_response = await self.segment(self.request(f"/?{query}", authenticated=False))
 
-        self.assertEqual(response_2.status_code, 200)
-        data_1 = b"".join(response_1.streaming_content)
-        data_2 = b"".join(response_2.streaming_content)
-        self.assertEqual(data_1, data_2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(segment_response.status_code, 200)
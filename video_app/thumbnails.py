@@ -0,0 +1,78 @@
+import hashlib, os, shutil, tempfile
+
+from django.conf import settings
+from PIL import Image, ImageOps, features
+
+
+PIL_FORMATS = {"webp": "WEBP", "jpeg": "JPEG", "avif": "AVIF"}
+PIL_FEATURES = {"webp": "webp", "jpeg": "jpg", "avif": "avif"}
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg", "avif": "avif"}
+
+
+def variants_dir_name(video_id):
+    """
+    Relative to MEDIA_ROOT, like the names of the file fields.
+    """
+
+    return os.path.join('thumbnails', 'variants', str(video_id))
+
+
+def create_variants(video):
+    """
+    Resizes the uploaded thumbnail to the configured widths (never upscaled) in every configured format.
+    Returns {format: {width: name}}. The file names contain a hash of the original, so they can be cached forever.
+    """
+
+    config = settings.THUMBNAIL_VARIANTS
+    output_dir = os.path.join(settings.MEDIA_ROOT, variants_dir_name(video.id))
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.makedirs(output_dir)
+
+    with Image.open(video.thumbnail.path) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+
+    version = hashlib.md5(video.thumbnail.name.encode()).hexdigest()[:8]
+    variants = {}
+    for file_format in _available_formats(config["FORMATS"]):
+        for width in _widths(config["WIDTHS"], image.width):
+            name = os.path.join(variants_dir_name(video.id), f"{width}-{version}.{EXTENSIONS[file_format]}")
+            _save(_resize(image, width, file_format), os.path.join(settings.MEDIA_ROOT, name), file_format, config["QUALITY"])
+            variants.setdefault(file_format, {})[str(width)] = name
+    return variants
+
+
+def delete_variants(video_id):
+    shutil.rmtree(os.path.join(settings.MEDIA_ROOT, variants_dir_name(video_id)), ignore_errors=True)
+
+
+def _available_formats(formats):
+    # AVIF needs a Pillow build with libavif; without it the variant is skipped, WebP and JPEG remain.
+    return [file_format for file_format in formats if features.check(PIL_FEATURES[file_format])]
+
+
+def _widths(widths, source_width):
+    fitting = [width for width in sorted(widths) if width <= source_width]
+    return fitting or [source_width]
+
+
+def _resize(image, width, file_format):
+    height = max(1, round(image.height * width / image.width))
+    has_alpha = "A" in image.getbands() or "transparency" in image.info
+    resized = image.convert("RGBA" if has_alpha else "RGB").resize((width, height), Image.Resampling.LANCZOS)
+    if file_format != "jpeg" or not has_alpha:
+        return resized
+
+    # JPEG has no alpha channel: transparent areas become white instead of black.
+    background = Image.new("RGB", resized.size, "white")
+    background.paste(resized, mask=resized.getchannel("A"))
+    return background
+
+
+def _save(image, path, file_format, quality):
+    # Renamed into place: the serializer never links a half-written file.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        image.save(f, PIL_FORMATS[file_format], quality=quality, optimize=file_format == "jpeg")
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
@@ -0,0 +1,249 @@
+import json, math, os, re, subprocess
+
+
+AVC_PROFILES = {"Baseline": "42", "Constrained Baseline": "42", "Main": "4d", "High": "64"}
+AAC_PROFILES = {"LC": "mp4a.40.2", "HE-AAC": "mp4a.40.5", "HE-AACv2": "mp4a.40.29"}
+INIT_SEGMENT_NAME = "init.mp4"  # fMP4/CMAF renditions (EXT-X-MAP)
+SINGLE_FILE_NAMES = {"mpegts": "media.ts", "fmp4": "media.m4s"}  # HLS_SINGLE_FILE renditions (EXT-X-BYTERANGE)
+ATTRIBUTE_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+class InvalidVideoError(Exception):
+    """
+    ffprobe cannot read the file as a video (corrupt upload, wrong format, no video stream).
+    """
+
+
+class ProbeUnavailableError(Exception):
+    """
+    ffprobe itself cannot be started (not installed, not executable): the file could not be checked.
+    An error of the installation, not of the upload, so it is not an InvalidVideoError.
+    """
+
+
+def ffprobe(path):
+    """
+    Returns the ffprobe JSON (streams and format) of a media file.
+    """
+
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-print_format", "json", "-show_streams", "-show_format", path],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(result.stdout)
+
+
+def video_stream(probe):
+    return next((s for s in probe.get("streams", []) if s.get("codec_type") == "video"), None)
+
+
+def audio_stream(probe):
+    return next((s for s in probe.get("streams", []) if s.get("codec_type") == "audio"), None)
+
+
+def probe_source(input_path):
+    """
+    Duration (seconds), resolution, frame rate, codecs and bitrate (bits/s) of an uploaded video.
+    Raises InvalidVideoError if the file is not a decodable video, ProbeUnavailableError if ffprobe cannot be run.
+    """
+
+    try:
+        probe = ffprobe(input_path)
+    except (subprocess.CalledProcessError, ValueError) as error:
+        raise InvalidVideoError(f"ffprobe cannot read {os.path.basename(input_path)}.") from error
+    except OSError as error:
+        raise ProbeUnavailableError(f"ffprobe could not be started: {error}") from error
+
+    stream = video_stream(probe)
+    file_format = probe.get("format", {})
+    duration = _float(file_format.get("duration"))
+    if stream is None or not stream.get("width") or not duration:
+        raise InvalidVideoError(f"{os.path.basename(input_path)} has no video stream with a duration.")
+
+    return {
+        "duration": duration,
+        "width": int(stream["width"]),
+        "height": int(stream.get("height") or 0),
+        "fps": frame_rate(stream.get("avg_frame_rate")),
+        "video_codec": stream.get("codec_name", ""),
+        "audio_codec": (audio_stream(probe) or {}).get("codec_name", ""),
+        "bitrate": int(_float(file_format.get("bit_rate"))) or None,
+    }
+
+
+def frame_rate(value):
+    """
+    "30000/1001" → 29.97
+    """
+
+    try:
+        numerator, _, denominator = (value or "").partition("/")
+        return round(float(numerator) / float(denominator or 1), 3)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def renditions_for_source(resolutions, source_height):
+    """
+    Drops renditions above the source height (no upscaling). The lowest rendition is always kept.
+    """
+
+    if not source_height:
+        return dict(resolutions)
+
+    fitting = {res: size for res, size in resolutions.items() if int(size.split(":")[1]) <= source_height}
+    if not fitting:
+        lowest = min(resolutions, key=lambda res: int(resolutions[res].split(":")[1]))
+        fitting = {lowest: resolutions[lowest]}
+    return fitting
+
+
+def read_media_playlist(index_path):
+    """
+    Returns {"map": (uri, byte_range) or None, "segments": [(segment_name, duration_seconds, byte_range), ...]}
+    from a media playlist. byte_range is (length, offset) in single-file renditions (EXT-X-BYTERANGE), otherwise None.
+    """
+
+    playlist = {"map": None, "segments": []}
+    duration = byte_range = None
+    next_offset = 0
+    with open(index_path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",")[0])
+            elif line.startswith("#EXT-X-BYTERANGE:"):
+                byte_range = _byte_range(line[len("#EXT-X-BYTERANGE:"):], next_offset)
+                next_offset = sum(byte_range)
+            elif line.startswith("#EXT-X-MAP:"):
+                attributes = {key: value.strip('"') for key, value in ATTRIBUTE_RE.findall(line[len("#EXT-X-MAP:"):])}
+                map_range = _byte_range(attributes["BYTERANGE"], 0) if "BYTERANGE" in attributes else None
+                playlist["map"] = (attributes["URI"], map_range)
+            elif line and not line.startswith("#") and duration is not None:
+                playlist["segments"].append((line, duration, byte_range))
+                duration = byte_range = None
+    return playlist
+
+
+def measure_rendition(output_dir):
+    """
+    Measures peak and average bitrate (bits/s) of a finished rendition from its segment sizes and
+    durations and reads resolution and codecs from the first segment via ffprobe
+    (from the init segment for fMP4, the media segments carry no codec configuration).
+    """
+
+    playlist = read_media_playlist(os.path.join(output_dir, "index.m3u8"))
+    segments = playlist["segments"]
+    if not segments:
+        return None
+
+    sizes = [(byte_range[0] if byte_range else os.path.getsize(os.path.join(output_dir, name))) * 8 for name, _, byte_range in segments]
+    durations = [max(duration, 0.001) for _, duration, _ in segments]
+    probe = ffprobe(os.path.join(output_dir, _codec_source(output_dir, playlist)))
+    stream = video_stream(probe) or {}
+
+    return {
+        "bandwidth": math.ceil(max(size / duration for size, duration in zip(sizes, durations))),
+        "average_bandwidth": math.ceil(sum(sizes) / sum(durations)),
+        "resolution": f"{stream.get('width')}x{stream.get('height')}",
+        "codecs": codecs_string(probe),
+    }
+
+
+def codecs_string(probe):
+    """
+    RFC 6381 CODECS attribute, e.g. "avc1.4d401f,mp4a.40.2".
+    """
+
+    codecs = []
+    video = video_stream(probe)
+    if video and video.get("codec_name") == "h264":
+        profile = AVC_PROFILES.get(video.get("profile"), "4d")
+        codecs.append(f"avc1.{profile}00{int(video.get('level', 31)):02x}")
+
+    audio = audio_stream(probe)
+    if audio and audio.get("codec_name") == "aac":
+        codecs.append(AAC_PROFILES.get(audio.get("profile"), "mp4a.40.2"))
+
+    return ",".join(codecs)
+
+
+def build_master_playlist(output_base, resolutions, directories=None):
+    """
+    Builds the master playlist from the renditions that actually exist in output_base, lowest first.
+    directories maps a resolution to its current directory name (re-encodes, see manifest.py), default the resolution.
+    Returns None if no rendition is finished yet.
+    """
+
+    directories = directories or {}
+    lines, version = ["#EXTM3U", "", ""], 3
+    for res in sorted(resolutions, key=lambda res: int(resolutions[res].split(":")[1])):
+        name = directories.get(res, res)
+        output_dir = os.path.join(output_base, name)
+        if not os.path.exists(os.path.join(output_dir, "index.m3u8")):
+            continue
+
+        info = measure_rendition(output_dir)
+        if info is None:
+            continue
+        if os.path.exists(os.path.join(output_dir, INIT_SEGMENT_NAME)) or os.path.exists(os.path.join(output_dir, SINGLE_FILE_NAMES["fmp4"])):
+            version = 7  # EXT-X-MAP in the media playlists
+
+        attributes = f"BANDWIDTH={info['bandwidth']},AVERAGE-BANDWIDTH={info['average_bandwidth']},RESOLUTION={info['resolution']}"
+        if info["codecs"]:
+            attributes += f',CODECS="{info["codecs"]}"'
+        lines += [f"#EXT-X-STREAM-INF:{attributes}", f"{name}/index.m3u8"]
+
+    if len(lines) == 3:
+        return None
+    lines[1] = f"#EXT-X-VERSION:{version}"
+    return "\n".join(lines) + "\n"
+
+
+def build_trickplay_vtt(duration, interval, tile_width, tile_height, columns, rows):
+    """
+    WebVTT track that maps every interval of the video to its tile in the sprite sheets
+    (sprite_000.jpg, sprite_001.jpg, ... with columns x rows tiles each).
+    """
+
+    per_sheet = columns * rows
+    lines = ["WEBVTT", ""]
+    for index in range(max(1, math.ceil(duration / interval))):
+        sheet, position = divmod(index, per_sheet)
+        x, y = (position % columns) * tile_width, (position // columns) * tile_height
+        start, end = index * interval, min((index + 1) * interval, duration)
+        lines += [
+            f"{_vtt_timestamp(start)} --> {_vtt_timestamp(end)}",
+            f"sprite_{sheet:03d}.jpg#xywh={x},{y},{tile_width},{tile_height}",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def _vtt_timestamp(seconds):
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    return f"{hours:02d}:{minutes:02d}:{milliseconds // 1000:02d}.{milliseconds % 1000:03d}"
+
+
+def _codec_source(output_dir, playlist):
+    # fMP4 media segments carry no codec configuration: the init segment (or the single file containing it) does.
+    if playlist["map"]:
+        return playlist["map"][0]
+    if os.path.exists(os.path.join(output_dir, INIT_SEGMENT_NAME)):
+        return INIT_SEGMENT_NAME
+    return playlist["segments"][0][0]
+
+
+def _byte_range(value, next_offset):
+    # "<length>[@<offset>]"; without an offset the range continues the previous one.
+    length, _, offset = value.partition("@")
+    return int(length), int(offset) if offset else next_offset
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
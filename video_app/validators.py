@@ -0,0 +1,35 @@
+import os, tempfile
+
+from django.core.exceptions import ValidationError
+
+from .utils import InvalidVideoError, ProbeUnavailableError, probe_source
+
+
+def validate_video_file(value):
+    """
+    Rejects uploads that ffprobe cannot read as a video (admin and model forms),
+    before a transcode job is enqueued for them. Already stored files are not probed again.
+    """
+
+    if getattr(value, '_committed', True):
+        return
+
+    try:
+        _probe_upload(value.file)
+    except ProbeUnavailableError as error:
+        raise ValidationError(f"The uploaded video cannot be checked: {error}", code='probe_unavailable')
+    except InvalidVideoError as error:
+        raise ValidationError(f"The uploaded file is not a valid video: {error}", code='invalid_video')
+
+
+def _probe_upload(upload):
+    if hasattr(upload, 'temporary_file_path'):
+        return probe_source(upload.temporary_file_path())
+
+    # Small uploads are kept in memory by Django, ffprobe needs a file.
+    suffix = os.path.splitext(upload.name or '')[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+        for chunk in upload.chunks():
+            tmp.write(chunk)
+        tmp.flush()
+        return probe_source(tmp.name)